@@ -0,0 +1,91 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from fastapi import HTTPException
+
+from . import metrics
+
+# Pool sizing and back-pressure; ANALYTICS_POOL_WORKERS=0 keeps every job inline
+ANALYTICS_POOL_WORKERS = int(os.getenv("ANALYTICS_POOL_WORKERS", str(os.cpu_count() or 1)))
+ANALYTICS_MAX_PENDING = int(os.getenv("ANALYTICS_MAX_PENDING", str(ANALYTICS_POOL_WORKERS * 4)))
+ANALYTICS_SUBMIT_TIMEOUT = float(os.getenv("ANALYTICS_SUBMIT_TIMEOUT", "2"))
+ANALYTICS_JOB_TIMEOUT = float(os.getenv("ANALYTICS_JOB_TIMEOUT", "30"))
+# Jobs over fewer rows than this run in the request thread; pickling costs more than it saves
+ANALYTICS_INLINE_ROWS = int(os.getenv("ANALYTICS_INLINE_ROWS", "20000"))
+
+
+class AnalyticsPool:
+    """
+    Shared process pool for CPU-heavy analytics with a bounded number of pending jobs
+
+    Only worth it for jobs whose compute costs more than pickling their inputs; the sales
+    summaries are SQL aggregates and do not use it.
+    """
+
+    def __init__(self, workers=ANALYTICS_POOL_WORKERS, max_pending=ANALYTICS_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max(max_pending, 1)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        # Outside the lock: finishing jobs release their slots through _track_pending
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def run(self, rows, fn, *args):
+        """
+        Run fn(*args) inline for small inputs, otherwise in the pool
+
+        `rows` is the request's budget estimate: the number of rows the job will touch.
+        """
+        if rows < ANALYTICS_INLINE_ROWS or self.workers <= 0:
+            metrics.incr("analytics.inline")
+            return fn(*args)
+
+        self.start()
+        if not self._slots.acquire(timeout=ANALYTICS_SUBMIT_TIMEOUT):
+            metrics.incr("analytics.rejected")
+            raise HTTPException(status_code=503, detail="Analytics workers are busy, retry later")
+        self._track_pending(1)
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        # Free the slot when the job really ends: cancel() cannot stop a job that is already
+        # running, so a timed-out job keeps counting against max_pending until it finishes
+        future.add_done_callback(self._release)
+        metrics.incr("analytics.offloaded")
+        try:
+            return future.result(timeout=ANALYTICS_JOB_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            metrics.incr("analytics.timeouts")
+            raise HTTPException(status_code=504, detail="Analytics job timed out")
+
+    def _release(self, future=None):
+        self._track_pending(-1)
+        self._slots.release()
+
+    def _track_pending(self, delta):
+        with self._lock:
+            self._pending += delta
+            metrics.set_gauge("analytics.pending", self._pending)
+
+
+pool = AnalyticsPool()
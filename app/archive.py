@@ -0,0 +1,468 @@
+import os
+import json
+import mmap
+import zlib
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from .database import Sale, SalesDailyAggregate, SalesArchiveState
+
+SALES_ARCHIVE_DIR = os.getenv("SALES_ARCHIVE_DIR", "./sales_archive")
+SALES_ARCHIVE_HORIZON_DAYS = int(os.getenv("SALES_ARCHIVE_HORIZON_DAYS", "365"))
+SALES_ARCHIVE_CACHE_FILES = int(os.getenv("SALES_ARCHIVE_CACHE_FILES", "24"))
+
+MAGIC = b"FSA2"
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+# Column name -> array typecode; platform is dictionary-encoded (-1 for NULL)
+COLUMNS = {
+    "id": "q",
+    "product_id": "q",
+    "quantity": "q",
+    "total_price": "d",
+    "sale_date": "q",
+    "platform": "h",
+}
+# Every column but sale_date is compressed in blocks of this many rows
+BLOCK_ROWS = 65536
+BLOCK_COLUMNS = tuple(name for name in COLUMNS if name != "sale_date")
+
+
+def _to_micros(value):
+    return (value - EPOCH) // ONE_MICROSECOND
+
+
+def _from_micros(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _month_path(directory, month):
+    return os.path.join(directory, f"sales-{month.year:04d}-{month.month:02d}.col")
+
+
+class ArchiveFile:
+    """
+    One month of archived sales, memory-mapped
+
+    A JSON header is followed by the sale_date column, uncompressed so that date ranges are
+    bisected directly in the mapping, and by the other columns in independently
+    zlib-compressed blocks of BLOCK_ROWS rows. Readers decompress only the blocks overlapping
+    the rows they need; nothing is kept on the heap between calls.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.sale_dates = None
+        if self._map[:4] != MAGIC:
+            self.close()
+            raise ValueError(f"Not a sales archive file: {path}")
+        (header_length,) = struct.unpack_from("<I", self._map, 4)
+        header = json.loads(bytes(self._map[8:8 + header_length]))
+        self.rows = header["rows"]
+        self.platforms = header["platforms"]
+        self.block_rows = header["block_rows"]
+        self._blocks = header["blocks"]
+        self._data_offset = 8 + header_length
+        offset, length = header["sale_date"]
+        start = self._data_offset + offset
+        self.sale_dates = memoryview(self._map)[start:start + length].cast(COLUMNS["sale_date"])
+        # Files evicted from the SalesArchive cache are closed once their last reader is done
+        self._users = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    def date_slice(self, start=None, end=None):
+        """
+        Return (i, j) such that rows[i:j] have start <= sale_date < end
+        """
+        i = bisect_left(self.sale_dates, _to_micros(start)) if start is not None else 0
+        j = bisect_left(self.sale_dates, _to_micros(end)) if end is not None else self.rows
+        return i, max(i, j)
+
+    def block(self, name, index):
+        """
+        Decompress block `index` of column `name`
+        """
+        offset, length = self._blocks[name][index]
+        start = self._data_offset + offset
+        view = memoryview(self._map)[start:start + length]
+        try:
+            values = array(COLUMNS[name])
+            values.frombytes(zlib.decompress(view))
+        finally:
+            view.release()
+        return values
+
+    def blocks(self, names, i, j):
+        """
+        Yield (first_row, {name: values}) for each block overlapping rows[i:j]
+        """
+        if i >= j:
+            return
+        for index in range(i // self.block_rows, (j - 1) // self.block_rows + 1):
+            yield index * self.block_rows, {name: self.block(name, index) for name in names}
+
+    def read_all(self):
+        rows = []
+        for first, block in self.blocks(BLOCK_COLUMNS, 0, self.rows):
+            for offset in range(len(block["id"])):
+                code = block["platform"][offset]
+                rows.append({
+                    "id": block["id"][offset],
+                    "product_id": block["product_id"][offset],
+                    "quantity": block["quantity"][offset],
+                    "total_price": block["total_price"][offset],
+                    "sale_date": _from_micros(self.sale_dates[first + offset]),
+                    "platform": self.platforms[code] if code >= 0 else None,
+                })
+        return rows
+
+    def acquire(self):
+        with self._lock:
+            self._users += 1
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            idle = self._retired and self._users == 0
+        if idle:
+            self.close()
+
+    def retire(self):
+        """
+        Close now, or as soon as the last reader releases the file
+        """
+        with self._lock:
+            self._retired = True
+            idle = self._users == 0
+        if idle:
+            self.close()
+
+    def close(self):
+        if self.sale_dates is not None:
+            self.sale_dates.release()
+            self.sale_dates = None
+        self._map.close()
+        self._file.close()
+
+
+class SalesArchive:
+    """
+    Directory of monthly archive files with a small LRU of open (memory-mapped) files
+    """
+
+    def __init__(self, directory=SALES_ARCHIVE_DIR, cache_files=SALES_ARCHIVE_CACHE_FILES):
+        self.directory = directory
+        self.cache_files = max(cache_files, 1)
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def month_file(self, month):
+        """
+        Return the month's file acquired for the caller (who must release() it), or None
+        """
+        path = _month_path(self.directory, month)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._open.get(path)
+            if cached is not None and cached[0] == mtime:
+                self._open.move_to_end(path)
+                cached[1].acquire()
+                return cached[1]
+            archive_file = ArchiveFile(path)
+            archive_file.acquire()
+            if cached is not None:
+                # Rewritten by the archive job; readers still holding the old mapping keep it open
+                del self._open[path]
+                cached[1].retire()
+            self._open[path] = (mtime, archive_file)
+            while len(self._open) > self.cache_files:
+                _, (_, evicted) = self._open.popitem(last=False)
+                evicted.retire()
+            return archive_file
+
+    def files(self, start, end):
+        """
+        Yield the archive files overlapping [start, end), oldest first
+        """
+        if start is None:
+            months = sorted(
+                datetime.strptime(name[len("sales-"):-len(".col")], "%Y-%m")
+                for name in (os.listdir(self.directory) if os.path.isdir(self.directory) else [])
+                if name.startswith("sales-") and name.endswith(".col")
+            )
+            if not months:
+                return
+            month = months[0]
+        else:
+            month = _month_start(start)
+        while month < end:
+            archive_file = self.month_file(month)
+            if archive_file is not None:
+                try:
+                    yield archive_file
+                finally:
+                    archive_file.release()
+            month = _next_month(month)
+
+    def summarize(self, start, end):
+        """
+        (total_sales, total_revenue, products_sold) of archived sales with start <= sale_date < end
+        """
+        total_sales, total_revenue, products_sold = 0, 0.0, 0
+        for archive_file in self.files(start, end):
+            i, j = archive_file.date_slice(start, end)
+            total_sales += j - i
+            for first, block in archive_file.blocks(("total_price", "quantity"), i, j):
+                low, high = max(i - first, 0), min(j - first, len(block["quantity"]))
+                total_revenue += sum(block["total_price"][low:high])
+                products_sold += sum(block["quantity"][low:high])
+        return total_sales, total_revenue, products_sold
+
+    def find(self, start, end, product_ids=None, platform=None, skip=0, limit=100):
+        """
+        Archived sales in [start, end) matching the filters, oldest first, as plain dicts
+        """
+        results = []
+        for archive_file in self.files(start, end):
+            i, j = archive_file.date_slice(start, end)
+            platform_code = None
+            if platform is not None:
+                if platform not in archive_file.platforms:
+                    continue
+                platform_code = archive_file.platforms.index(platform)
+            for first, block in archive_file.blocks(BLOCK_COLUMNS, i, j):
+                product_column = block["product_id"]
+                platform_column = block["platform"]
+                for offset in range(max(i - first, 0), min(j - first, len(product_column))):
+                    if product_ids is not None and product_column[offset] not in product_ids:
+                        continue
+                    if platform_code is not None and platform_column[offset] != platform_code:
+                        continue
+                    if skip:
+                        skip -= 1
+                        continue
+                    code = platform_column[offset]
+                    results.append({
+                        "id": block["id"][offset],
+                        "product_id": product_column[offset],
+                        "quantity": block["quantity"][offset],
+                        "total_price": block["total_price"][offset],
+                        "sale_date": _from_micros(archive_file.sale_dates[first + offset]),
+                        "platform": archive_file.platforms[code] if code >= 0 else None,
+                    })
+                    if len(results) >= limit:
+                        return results
+        return results
+
+    def write_month(self, month, rows):
+        """
+        Merge `rows` into the month's file, replacing it atomically
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = _month_path(self.directory, month)
+        merged = {}
+        if os.path.exists(path):
+            existing = ArchiveFile(path)
+            try:
+                for row in existing.read_all():
+                    merged[row["id"]] = row
+            finally:
+                existing.close()
+        # Rows already present (from an interrupted earlier run) are de-duplicated by id
+        for row in rows:
+            merged[row["id"]] = row
+        ordered = sorted(merged.values(), key=lambda row: (row["sale_date"], row["id"]))
+
+        platforms = sorted({row["platform"] for row in ordered if row["platform"] is not None})
+        codes = {name: code for code, name in enumerate(platforms)}
+        values = {
+            "id": [row["id"] for row in ordered],
+            "product_id": [row["product_id"] for row in ordered],
+            "quantity": [row["quantity"] for row in ordered],
+            "total_price": [row["total_price"] for row in ordered],
+            "sale_date": [_to_micros(row["sale_date"]) for row in ordered],
+            "platform": [codes.get(row["platform"], -1) for row in ordered],
+        }
+        # sale_date goes first, uncompressed and 8-byte aligned, so it can be bisected in place
+        sale_dates = array(COLUMNS["sale_date"], values["sale_date"]).tobytes()
+        blobs, blocks, offset = [sale_dates], {}, len(sale_dates)
+        for name in BLOCK_COLUMNS:
+            blocks[name] = []
+            for first in range(0, len(ordered), BLOCK_ROWS):
+                block = array(COLUMNS[name], values[name][first:first + BLOCK_ROWS]).tobytes()
+                blob = zlib.compress(block, 6)
+                blocks[name].append([offset, len(blob)])
+                offset += len(blob)
+                blobs.append(blob)
+        header = json.dumps({
+            "rows": len(ordered),
+            "platforms": platforms,
+            "block_rows": BLOCK_ROWS,
+            "sale_date": [0, len(sale_dates)],
+            "blocks": blocks,
+        }).encode()
+        header += b" " * (-(8 + len(header)) % 8)
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as archive_file:
+            archive_file.write(MAGIC)
+            archive_file.write(struct.pack("<I", len(header)))
+            archive_file.write(header)
+            for blob in blobs:
+                archive_file.write(blob)
+            archive_file.flush()
+            os.fsync(archive_file.fileno())
+        os.replace(tmp_path, path)
+        return len(ordered)
+
+
+archive = SalesArchive()
+
+
+def get_watermark(db):
+    """
+    Sales strictly before this datetime are archived; None when nothing has been archived
+    """
+    state = db.get(SalesArchiveState, 1)
+    return state.archived_before if state else None
+
+
+def archived_summary(db, start, end, watermark=None):
+    """
+    Totals of archived sales with start <= sale_date < end
+
+    Day-aligned ranges are answered from `sales_daily_aggregates`; other ranges scan the files.
+    """
+    if watermark is None or start >= watermark:
+        return 0, 0.0, 0
+    end = min(end, watermark)
+    if _is_midnight(start) and _is_midnight(end):
+        row = db.query(
+            func.coalesce(func.sum(SalesDailyAggregate.total_sales), 0),
+            func.coalesce(func.sum(SalesDailyAggregate.total_revenue), 0.0),
+            func.coalesce(func.sum(SalesDailyAggregate.products_sold), 0),
+        ).filter(
+            SalesDailyAggregate.day >= start.date(),
+            SalesDailyAggregate.day < end.date()
+        ).one()
+        return int(row[0]), float(row[1]), int(row[2])
+    return archive.summarize(start, end)
+
+
+def archived_daily_totals(db, start_day, end_day, watermark=None):
+    """
+    {day: (total_sales, total_revenue, products_sold)} of archived sales for start_day <= day < end_day
+    """
+    if watermark is None or start_day >= watermark.date():
+        return {}
+    rows = db.query(
+        SalesDailyAggregate.day,
+        func.sum(SalesDailyAggregate.total_sales),
+        func.sum(SalesDailyAggregate.total_revenue),
+        func.sum(SalesDailyAggregate.products_sold),
+    ).filter(
+        SalesDailyAggregate.day >= start_day,
+        SalesDailyAggregate.day < end_day
+    ).group_by(SalesDailyAggregate.day).all()
+    return {row[0]: (int(row[1]), float(row[2]), int(row[3])) for row in rows}
+
+
+def _is_midnight(value):
+    return value.hour == 0 and value.minute == 0 and value.second == 0 and value.microsecond == 0
+
+
+def archive_sales(db, horizon_days=SALES_ARCHIVE_HORIZON_DAYS, sales_archive=None):
+    """
+    Move sales older than the horizon into the archive, one month per transaction
+
+    Only whole months move: the cutoff is the start of the month containing `now - horizon`,
+    so each month file is written once instead of being rewritten by every daily run.
+
+    For each month the file is written first; the hot rows are then deleted, their daily
+    aggregates added and the watermark advanced in a single transaction. If the process
+    dies in between, the next run rewrites the file (de-duplicating by id) and retries.
+    """
+    sales_archive = sales_archive or archive
+    now = datetime.utcnow()
+    cutoff = _month_start(now - timedelta(days=horizon_days))
+    moved = 0
+
+    oldest = db.query(func.min(Sale.sale_date)).filter(Sale.sale_date < cutoff).scalar()
+    if oldest is None:
+        return moved
+    month = _month_start(oldest)
+    while month < cutoff:
+        month_end = _next_month(month)
+        sales = db.query(
+            Sale.id, Sale.product_id, Sale.quantity, Sale.total_price, Sale.sale_date, Sale.platform
+        ).filter(Sale.sale_date >= month, Sale.sale_date < month_end).all()
+        rows = [dict(sale._mapping) for sale in sales]
+        if rows:
+            sales_archive.write_month(month, rows)
+        _commit_month(db, rows, month_end)
+        moved += len(rows)
+        month = _next_month(month)
+    return moved
+
+
+def _commit_month(db, rows, archived_before):
+    try:
+        totals = defaultdict(lambda: [0, 0.0, 0])
+        for row in rows:
+            bucket = totals[(row["sale_date"].date(), row["product_id"], row["platform"])]
+            bucket[0] += 1
+            bucket[1] += row["total_price"]
+            bucket[2] += row["quantity"]
+
+        if totals:
+            days = {day for day, _, _ in totals}
+            existing = {
+                (aggregate.day, aggregate.product_id, aggregate.platform): aggregate
+                for aggregate in db.query(SalesDailyAggregate).filter(SalesDailyAggregate.day.in_(days))
+            }
+            for key, (total_sales, total_revenue, products_sold) in totals.items():
+                aggregate = existing.get(key)
+                if aggregate is None:
+                    aggregate = SalesDailyAggregate(
+                        day=key[0], product_id=key[1], platform=key[2],
+                        total_sales=0, total_revenue=0.0, products_sold=0
+                    )
+                    db.add(aggregate)
+                aggregate.total_sales += total_sales
+                aggregate.total_revenue += total_revenue
+                aggregate.products_sold += products_sold
+
+        ids = [row["id"] for row in rows]
+        for i in range(0, len(ids), 1000):
+            db.query(Sale).filter(Sale.id.in_(ids[i:i + 1000])).delete(synchronize_session=False)
+
+        state = db.get(SalesArchiveState, 1)
+        if state is None:
+            state = SalesArchiveState(id=1)
+            db.add(state)
+        if state.archived_before is None or state.archived_before < archived_before:
+            state.archived_before = archived_before
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
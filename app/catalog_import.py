@@ -0,0 +1,285 @@
+import os
+import csv
+import json
+import time
+import codecs
+from datetime import datetime
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import Category, Product, Inventory
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+MAX_REPORTED_ERRORS = 100
+# Checked per row so that strict databases never reject a whole chunk over one long name
+PRODUCT_NAME_LENGTH = Product.__table__.c.name.type.length
+CATEGORY_NAME_LENGTH = Category.__table__.c.name.type.length
+COUNTERS = ("inserted", "updated", "categories_created")
+FORMATS = ("csv", "ndjson")
+
+
+class RowError(ValueError):
+    pass
+
+
+def iter_lines(chunks, encoding="utf-8"):
+    """
+    Turn an iterable of byte chunks into text lines (line endings kept) without buffering the whole input
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        # Only "\n" ends a line: str.splitlines() would also split on U+2028, "\x85" and
+        # friends, which may appear raw inside JSON strings. "\r\n" stays in one piece.
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+class CatalogImporter:
+    """
+    Upsert products (and their categories and initial inventory) from CSV or NDJSON rows
+
+    Rows are processed in chunks of `chunk_size`, each with a handful of batched statements
+    and one commit. Products are matched on (name, category); categories on name, from a map
+    loaded once. Names are casefolded before matching, as MySQL's default collation compares
+    them, so a differently cased spelling matches the stored row. Existing inventory is never
+    changed; new products get an inventory row with the row's `quantity` (default 0) and
+    `low_stock_threshold` (default 10).
+
+    A chunk that fails in the database is rolled back and reported as an error on its first
+    line; chunks committed before it stay, and the import continues with the next chunk.
+    """
+
+    def __init__(self, db, chunk_size=IMPORT_CHUNK_SIZE, on_progress=None):
+        self.db = db
+        self.chunk_size = max(chunk_size, 1)
+        self.on_progress = on_progress
+        self._categories_stale = False
+        self._load_categories()
+        self.report = {
+            "rows": 0,
+            "inserted": 0,
+            "updated": 0,
+            "categories_created": 0,
+            "error_count": 0,
+            "errors": [],
+            "elapsed_seconds": 0.0,
+            "rows_per_second": 0.0,
+        }
+        self._started = None
+
+    def run(self, lines, fmt):
+        """
+        Import every row from `lines` and return the report
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        self._started = time.perf_counter()
+        chunk = []
+        for line_number, row in self._parse(lines, fmt):
+            chunk.append((line_number, row))
+            if len(chunk) >= self.chunk_size:
+                self._import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk)
+        self._update_timing()
+        return self.report
+
+    def _parse(self, lines, fmt):
+        if fmt == "ndjson":
+            for line_number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    if not isinstance(row, dict):
+                        raise ValueError("expected a JSON object")
+                except ValueError as e:
+                    self.report["rows"] += 1
+                    self._error(line_number, f"invalid JSON: {e}")
+                    continue
+                yield line_number, row
+        else:
+            reader = csv.DictReader(lines)
+            for row in reader:
+                yield reader.line_num, row
+
+    def _import_chunk(self, chunk):
+        rows = {}
+        for line_number, raw in chunk:
+            self.report["rows"] += 1
+            try:
+                row = self._clean(raw)
+            except RowError as e:
+                self._error(line_number, str(e))
+                continue
+            # Duplicates within a chunk: the last row wins
+            category = row["category"]
+            rows[(row["name"].casefold(), category.casefold() if isinstance(category, str) else category)] = row
+
+        counters = {key: self.report[key] for key in COUNTERS}
+        categories, category_ids = dict(self.categories), set(self.category_ids)
+        try:
+            if self._categories_stale:
+                self._load_categories()
+            self._create_categories([row["category"] for row in rows.values() if isinstance(row["category"], str)])
+            by_key = {}
+            for (name, category), row in rows.items():
+                del row["category"]
+                category_id = self.categories[category] if isinstance(category, str) else category
+                row["category_id"] = category_id
+                by_key[(name, category_id)] = row
+            self._upsert_products(by_key)
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            self.report.update(counters)
+            self.categories, self.category_ids = categories, category_ids
+            # Another import may have created some of the categories; reload before the next chunk
+            self._categories_stale = True
+            first_line, last_line = chunk[0][0], chunk[-1][0]
+            self._error(
+                first_line,
+                f"database error, lines {first_line}-{last_line} not imported: {getattr(e, 'orig', e)}",
+                count=len(rows)
+            )
+
+        self._update_timing()
+        if self.on_progress is not None:
+            self.on_progress(self.report)
+
+    def _clean(self, raw):
+        name = (raw.get("name") or "").strip()
+        if not name:
+            raise RowError("name is required")
+        if len(name) > PRODUCT_NAME_LENGTH:
+            raise RowError(f"name is longer than {PRODUCT_NAME_LENGTH} characters")
+        try:
+            price = float(raw.get("price"))
+        except (TypeError, ValueError):
+            raise RowError("price must be a number")
+
+        if raw.get("category_id") not in (None, ""):
+            try:
+                category = int(raw["category_id"])
+            except (TypeError, ValueError):
+                raise RowError("category_id must be an integer")
+            if category not in self.category_ids:
+                raise RowError(f"category {category} not found")
+        elif (raw.get("category") or "").strip():
+            category = raw["category"].strip()
+            if len(category) > CATEGORY_NAME_LENGTH:
+                raise RowError(f"category is longer than {CATEGORY_NAME_LENGTH} characters")
+        else:
+            raise RowError("category or category_id is required")
+
+        try:
+            quantity = int(raw.get("quantity") or 0)
+            low_stock_threshold = int(raw.get("low_stock_threshold") or 10)
+        except (TypeError, ValueError):
+            raise RowError("quantity and low_stock_threshold must be integers")
+
+        return {
+            "name": name,
+            "description": raw.get("description") or None,
+            "price": price,
+            "category": category,
+            "quantity": quantity,
+            "low_stock_threshold": low_stock_threshold,
+        }
+
+    def _load_categories(self):
+        self.categories = {
+            name.casefold(): category_id for category_id, name in self.db.query(Category.id, Category.name)
+        }
+        self.category_ids = set(self.categories.values())
+        self._categories_stale = False
+
+    def _create_categories(self, names):
+        missing = {}
+        for name in names:
+            # The first spelling wins; MySQL's unique index would reject the others
+            if name.casefold() not in self.categories:
+                missing.setdefault(name.casefold(), name)
+        if not missing:
+            return
+        self.db.execute(insert(Category), [{"name": name} for name in missing.values()])
+        for category_id, name in self.db.query(Category.id, Category.name).filter(
+            Category.name.in_(missing.values())
+        ):
+            self.categories[name.casefold()] = category_id
+            self.category_ids.add(category_id)
+        self.report["categories_created"] += len(missing)
+
+    def _upsert_products(self, by_key):
+        if not by_key:
+            return
+        names = {row["name"] for row in by_key.values()}
+        existing = {
+            (name.casefold(), category_id): product_id
+            for product_id, name, category_id in self.db.query(
+                Product.id, Product.name, Product.category_id
+            ).filter(Product.name.in_(names))
+        }
+
+        now = datetime.utcnow()
+        updates = [
+            {
+                "id": existing[key],
+                "description": row["description"],
+                "price": row["price"],
+                "updated_at": now,
+            }
+            for key, row in by_key.items() if key in existing
+        ]
+        inserts = [
+            {
+                "name": row["name"],
+                "description": row["description"],
+                "price": row["price"],
+                "category_id": row["category_id"],
+                "created_at": now,
+                "updated_at": now,
+            }
+            for key, row in by_key.items() if key not in existing
+        ]
+        if updates:
+            self.db.execute(update(Product), updates)
+        if inserts:
+            self.db.execute(insert(Product), inserts)
+            new_keys = {(row["name"].casefold(), row["category_id"]) for row in inserts}
+            created = {
+                (name.casefold(), category_id): product_id
+                for product_id, name, category_id in self.db.query(
+                    Product.id, Product.name, Product.category_id
+                ).filter(Product.name.in_({row["name"] for row in inserts}))
+                if (name.casefold(), category_id) in new_keys
+            }
+            self.db.execute(insert(Inventory), [
+                {
+                    "product_id": product_id,
+                    "quantity": by_key[key]["quantity"],
+                    "low_stock_threshold": by_key[key]["low_stock_threshold"],
+                    "last_updated": now,
+                }
+                for key, product_id in created.items()
+            ])
+        self.report["updated"] += len(updates)
+        self.report["inserted"] += len(inserts)
+
+    def _error(self, line_number, message, count=1):
+        self.report["error_count"] += count
+        if len(self.report["errors"]) < MAX_REPORTED_ERRORS:
+            self.report["errors"].append({"line": line_number, "error": message})
+
+    def _update_timing(self):
+        elapsed = time.perf_counter() - self._started
+        self.report["elapsed_seconds"] = round(elapsed, 3)
+        self.report["rows_per_second"] = round(self.report["rows"] / elapsed, 1) if elapsed > 0 else 0.0
@@ -0,0 +1,175 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+
+from .database import (
+    SessionLocal, get_engine, Inventory, InventoryHistory, InventoryCheckpoint, InventoryCheckpointItem, Product
+)
+
+INVENTORY_CHECKPOINT_INTERVAL = float(os.getenv("INVENTORY_CHECKPOINT_INTERVAL", "86400"))
+# History rows are absolute quantities, so replaying a change the checkpoint already contains
+# is harmless; backdating taken_at covers writes that were in flight while the copy was taken.
+CHECKPOINT_GRACE = timedelta(seconds=60)
+
+
+def create_checkpoint(db, slot=None):
+    """
+    Copy every inventory quantity into a new checkpoint with a single INSERT ... SELECT
+
+    Raises IntegrityError if another checkpoint already holds `slot`.
+    """
+    try:
+        checkpoint = InventoryCheckpoint(taken_at=datetime.utcnow() - CHECKPOINT_GRACE, slot=slot)
+        db.add(checkpoint)
+        db.flush()
+        db.execute(
+            insert(InventoryCheckpointItem).from_select(
+                ["checkpoint_id", "inventory_id", "product_id", "quantity"],
+                select(literal(checkpoint.id), Inventory.id, Inventory.product_id, Inventory.quantity)
+            )
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return checkpoint
+
+
+def inventory_as_of(db, ts):
+    """
+    Return (checkpoint, [(product_id, product_name, quantity)]) for every product that existed at `ts`
+
+    The quantity is the last history entry between the nearest checkpoint at or before `ts`
+    and `ts`, else the checkpoint's copy. Inventory without either (created after the
+    checkpoint, or `ts` older than every checkpoint) falls back to the first change after
+    `ts`, else the current quantity.
+    """
+    checkpoint = db.query(InventoryCheckpoint).filter(
+        InventoryCheckpoint.taken_at <= ts
+    ).order_by(InventoryCheckpoint.taken_at.desc()).first()
+
+    inventories = db.query(
+        Inventory.id, Inventory.product_id, Product.name, Inventory.quantity
+    ).join(Product, Inventory.product_id == Product.id).filter(
+        Product.created_at <= ts
+    ).order_by(Inventory.product_id).all()
+
+    quantities = {}
+    if checkpoint is not None:
+        quantities.update(_last_change_before(db, checkpoint.taken_at, ts))
+        copied_by = checkpoint.taken_at + 2 * CHECKPOINT_GRACE
+        if ts < copied_by:
+            # Close to the checkpoint the copy may already include changes made after ts
+            pending = [inventory.id for inventory in inventories if inventory.id not in quantities]
+            if pending:
+                quantities.update(_first_change_after(db, ts, pending, until=copied_by))
+        for inventory_id, quantity in db.query(
+            InventoryCheckpointItem.inventory_id, InventoryCheckpointItem.quantity
+        ).filter(InventoryCheckpointItem.checkpoint_id == checkpoint.id):
+            quantities.setdefault(inventory_id, quantity)
+
+    missing = [inventory.id for inventory in inventories if inventory.id not in quantities]
+    if missing:
+        quantities.update(_first_change_after(db, ts, missing))
+
+    return checkpoint, [
+        (inventory.product_id, inventory.name, quantities.get(inventory.id, inventory.quantity))
+        for inventory in inventories
+    ]
+
+
+def _last_change_before(db, start, end):
+    """
+    {inventory_id: new_quantity} of the latest change with start < change_date <= end
+    """
+    ranked = select(
+        InventoryHistory.inventory_id,
+        InventoryHistory.new_quantity,
+        func.row_number().over(
+            partition_by=InventoryHistory.inventory_id,
+            order_by=(InventoryHistory.change_date.desc(), InventoryHistory.id.desc())
+        ).label("position")
+    ).where(
+        InventoryHistory.change_date > start,
+        InventoryHistory.change_date <= end
+    ).subquery()
+    rows = db.execute(
+        select(ranked.c.inventory_id, ranked.c.new_quantity).where(ranked.c.position == 1)
+    ).all()
+    return dict(rows)
+
+
+def _first_change_after(db, ts, inventory_ids, until=None):
+    """
+    {inventory_id: previous_quantity} of the earliest change after `ts` (and at or before `until`)
+    """
+    conditions = [InventoryHistory.change_date > ts, InventoryHistory.inventory_id.in_(inventory_ids)]
+    if until is not None:
+        conditions.append(InventoryHistory.change_date <= until)
+    ranked = select(
+        InventoryHistory.inventory_id,
+        InventoryHistory.previous_quantity,
+        func.row_number().over(
+            partition_by=InventoryHistory.inventory_id,
+            order_by=(InventoryHistory.change_date, InventoryHistory.id)
+        ).label("position")
+    ).where(*conditions).subquery()
+    rows = db.execute(
+        select(ranked.c.inventory_id, ranked.c.previous_quantity).where(ranked.c.position == 1)
+    ).all()
+    return dict(rows)
+
+
+class CheckpointScheduler:
+    """
+    Background thread that takes a checkpoint whenever the latest one is older than `interval`
+
+    Every worker runs one; a due checkpoint claims the slot after the highest taken so far,
+    so workers that saw the same latest checkpoint race on the unique `slot` and only one
+    of them commits.
+    """
+
+    def __init__(self, interval=INVENTORY_CHECKPOINT_INTERVAL):
+        self.interval = interval
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name="inventory-checkpoints", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error creating inventory checkpoint: {e}")
+            self._stopping.wait(min(self.interval, 300))
+
+    def run_once(self):
+        get_engine()
+        db = SessionLocal()
+        try:
+            latest, slot = db.query(
+                func.max(InventoryCheckpoint.taken_at), func.max(InventoryCheckpoint.slot)
+            ).one()
+            due = datetime.utcnow() - timedelta(seconds=self.interval) - CHECKPOINT_GRACE
+            if latest is None or latest <= due:
+                try:
+                    return create_checkpoint(db, slot=(slot or 0) + 1)
+                except IntegrityError:
+                    # Another worker claimed this slot first
+                    return None
+        finally:
+            db.close()
@@ -1,10 +1,12 @@
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import create_engine, event, text, Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from fastapi import Request, Response
 import datetime
-import pymysql
+import threading
+import time
 
 load_dotenv()
 
@@ -13,35 +15,212 @@ DB_USER = os.getenv("DB_USER", "root")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "")
 DB_NAME = os.getenv("DB_NAME", "forsit_test")
 
-try:
-    connection = pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD
+# DATABASE_URL overrides the MySQL settings above, e.g. sqlite:///./forsit.db for local runs
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+)
+# Read-only replica for analytics/listing queries; defaults to the primary when unset
+DB_READ_HOST = os.getenv("DB_READ_HOST")
+SQLALCHEMY_READ_DATABASE_URL = os.getenv(
+    "READ_DATABASE_URL",
+    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_READ_HOST}/{DB_NAME}" if DB_READ_HOST else None
+)
+# After a write, the same client reads from the primary for this many seconds
+DB_STICKY_SECONDS = float(os.getenv("DB_STICKY_SECONDS", "5"))
+STICKY_COOKIE = "db_primary_until"
+# init_db() never runs DDL on a non-SQLite replica unless this is set
+DB_CREATE_REPLICA_SCHEMA = os.getenv("DB_CREATE_REPLICA_SCHEMA", "false").lower() == "true"
+# Run on every replica connection so that a misrouted write fails instead of diverging the replica
+READ_ONLY_STATEMENTS = {
+    "mysql": "SET SESSION TRANSACTION READ ONLY",
+    "postgresql": "SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY",
+    "sqlite": "PRAGMA query_only = ON",
+}
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+# Sessions are bound lazily by get_engine(), so importing this module never touches the database
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+_engine = None
+_read_engine = None
+_engine_lock = threading.Lock()
+
+
+def _build_engine(url, read_only=False):
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    engine = create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        connect_args=connect_args,
     )
-    cursor = connection.cursor()
-    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME}")
-    connection.commit()
-    
-    cursor.close()
-    connection.close()
-    print(f"Database '{DB_NAME}' ensured.")
-except Exception as e:
-    print(f"Error ensuring database exists: {e}")
+    statement = READ_ONLY_STATEMENTS.get(engine.dialect.name) if read_only else None
+    if statement:
+        @event.listens_for(engine, "connect")
+        def set_read_only(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute(statement)
+            finally:
+                cursor.close()
+    return engine
+
+
+def get_engine():
+    """
+    Return the primary engine, creating it on first use
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _build_engine(SQLALCHEMY_DATABASE_URL)
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def get_read_engine():
+    """
+    Return the replica engine (or the primary when no replica is configured)
+    """
+    global _read_engine
+    if _read_engine is None:
+        if not SQLALCHEMY_READ_DATABASE_URL:
+            engine = get_engine()
+            with _engine_lock:
+                if _read_engine is None:
+                    _read_engine = engine
+                    ReadSessionLocal.configure(bind=engine)
+        else:
+            with _engine_lock:
+                if _read_engine is None:
+                    _read_engine = _build_engine(SQLALCHEMY_READ_DATABASE_URL, read_only=True)
+                    ReadSessionLocal.configure(bind=_read_engine)
+    return _read_engine
+
+
+def dispose_engine():
+    """
+    Close all pooled connections of the primary and replica engines
+    """
+    global _engine, _read_engine
+    with _engine_lock:
+        if _read_engine is not None and _read_engine is not _engine:
+            _read_engine.dispose()
+        _read_engine = None
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+def ensure_database():
+    """
+    Create the MySQL database if it does not exist yet (no-op for other backends)
+    """
+    if not SQLALCHEMY_DATABASE_URL.startswith("mysql"):
+        return
+    import pymysql
+
+    try:
+        connection = pymysql.connect(
+            host=DB_HOST,
+            user=DB_USER,
+            password=DB_PASSWORD
+        )
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME}")
+        connection.commit()
+
+        cursor.close()
+        connection.close()
+        print(f"Database '{DB_NAME}' ensured.")
+    except Exception as e:
+        print(f"Error ensuring database exists: {e}")
+
 
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def init_db():
+    """
+    Explicit schema setup: ensure the database exists and create missing tables
+
+    A real replica gets its tables through replication; DDL run on it directly would make
+    replication fail once the primary's CREATE TABLE arrives. Replica tables are therefore
+    only created for a SQLite stand-in, or when DB_CREATE_REPLICA_SCHEMA is set, through a
+    short-lived engine since the replica engine itself is read-only.
+    """
+    ensure_database()
+    Base.metadata.create_all(bind=get_engine())
+    if _creates_replica_schema():
+        engine = create_engine(SQLALCHEMY_READ_DATABASE_URL)
+        try:
+            Base.metadata.create_all(bind=engine)
+        finally:
+            engine.dispose()
+
+
+def _creates_replica_schema():
+    if not SQLALCHEMY_READ_DATABASE_URL or SQLALCHEMY_READ_DATABASE_URL == SQLALCHEMY_DATABASE_URL:
+        return False
+    return DB_CREATE_REPLICA_SCHEMA or SQLALCHEMY_READ_DATABASE_URL.startswith("sqlite")
+
+
+def warm_pool(size=None):
+    """
+    Open up to `size` pooled connections ahead of the first request
+    """
+    engine = get_engine()
+    connections = []
+    try:
+        for _ in range(size if size is not None else DB_POOL_SIZE):
+            connection = engine.connect()
+            connection.execute(text("SELECT 1"))
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
 
 
 Base = declarative_base()
-def get_db():
+def get_db(request: Request, response: Response):
+    get_engine()
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        # Pin this client to the primary so its next reads see the write
+        response.set_cookie(
+            STICKY_COOKIE,
+            str(time.time() + DB_STICKY_SECONDS),
+            max_age=max(int(DB_STICKY_SECONDS), 1),
+            httponly=True,
+        )
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+def get_read_db(request: Request):
+    if _reads_pinned_to_primary(request):
+        get_engine()
+        db = SessionLocal()
+    else:
+        get_read_engine()
+        db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _reads_pinned_to_primary(request):
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
 class Category(Base):
     __tablename__ = "categories"
     
@@ -95,7 +274,7 @@ class InventoryHistory(Base):
     inventory_id = Column(Integer, ForeignKey("inventory.id"))
     previous_quantity = Column(Integer)
     new_quantity = Column(Integer)
-    change_date = Column(DateTime, default=datetime.datetime.utcnow)
+    change_date = Column(DateTime, default=datetime.datetime.utcnow, index=True)
     
     # Relationships
     inventory = relationship("Inventory", back_populates="history")
@@ -117,4 +296,76 @@ class Sale(Base):
     product = relationship("Product", back_populates="sales")
     
     def __repr__(self):
-        return f"<Sale {self.product.name if self.product else 'Unknown'}: {self.quantity} units>"
\ No newline at end of file
+        return f"<Sale {self.product.name if self.product else 'Unknown'}: {self.quantity} units>"
+
+
+class SaleIngestBatch(Base):
+    __tablename__ = "sale_ingest_batches"
+    
+    # Journal segment name; written in the same transaction as the segment's sales
+    id = Column(String(64), primary_key=True)
+    sales_count = Column(Integer, nullable=False)
+    applied_at = Column(DateTime, default=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SaleIngestBatch {self.id}: {self.sales_count} sales>"
+
+class SalesDailyAggregate(Base):
+    __tablename__ = "sales_daily_aggregates"
+    __table_args__ = (
+        UniqueConstraint("day", "product_id", "platform", name="uq_sales_daily_aggregate"),
+    )
+    
+    # Per-day totals of sales that were moved to the archive files
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"))
+    platform = Column(String(50), nullable=True)
+    total_sales = Column(Integer, nullable=False, default=0)
+    total_revenue = Column(Float, nullable=False, default=0.0)
+    products_sold = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<SalesDailyAggregate {self.day} product {self.product_id}: {self.total_sales} sales>"
+
+class SalesArchiveState(Base):
+    __tablename__ = "sales_archive_state"
+    
+    # Single row: sales before `archived_before` live in the archive, the rest in `sales`
+    id = Column(Integer, primary_key=True)
+    archived_before = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SalesArchiveState before {self.archived_before}>"
+
+
+class InventoryCheckpoint(Base):
+    __tablename__ = "inventory_checkpoints"
+    
+    # Full copy of `inventory` quantities; point-in-time lookups replay history from here
+    id = Column(Integer, primary_key=True, index=True)
+    taken_at = Column(DateTime, nullable=False, index=True)
+    # Scheduled checkpoints claim the next slot; the unique index lets only one worker take it
+    slot = Column(Integer, nullable=True, unique=True)
+    
+    # Relationships
+    items = relationship("InventoryCheckpointItem", back_populates="checkpoint")
+    
+    def __repr__(self):
+        return f"<InventoryCheckpoint {self.taken_at}>"
+
+class InventoryCheckpointItem(Base):
+    __tablename__ = "inventory_checkpoint_items"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    checkpoint_id = Column(Integer, ForeignKey("inventory_checkpoints.id"), index=True)
+    inventory_id = Column(Integer, ForeignKey("inventory.id"))
+    product_id = Column(Integer, ForeignKey("products.id"))
+    quantity = Column(Integer)
+    
+    # Relationships
+    checkpoint = relationship("InventoryCheckpoint", back_populates="items")
+    
+    def __repr__(self):
+        return f"<InventoryCheckpointItem product {self.product_id}: {self.quantity}>"
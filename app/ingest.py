@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from . import metrics
+from .database import SessionLocal, get_engine, Sale, Product, Inventory, InventoryHistory, SaleIngestBatch
+
+SALES_BUFFER_ENABLED = os.getenv("SALES_BUFFER_ENABLED", "true").lower() == "true"
+SALES_JOURNAL_DIR = os.getenv("SALES_JOURNAL_DIR", "./sales_journal")
+SALES_FLUSH_SIZE = int(os.getenv("SALES_FLUSH_SIZE", "500"))
+SALES_FLUSH_INTERVAL = float(os.getenv("SALES_FLUSH_INTERVAL", "1"))
+# Disabling fsync trades crash durability for append latency
+SALES_JOURNAL_FSYNC = os.getenv("SALES_JOURNAL_FSYNC", "true").lower() == "true"
+WORKER_PREFIX = "worker-"
+LOCK_NAME = ".lock"
+# Events whose product no longer exists when their segment is applied
+DEAD_LETTER_NAME = "rejected.jsonl"
+
+
+class SaleBuffer:
+    """
+    Write-behind buffer for single sale events
+
+    Each event is appended to the active journal segment before it is acknowledged. A
+    background thread seals the segment once it holds `flush_size` events or every
+    `flush_interval` seconds, and applies it to `sales` and `inventory` in one transaction.
+    The segment's name is recorded in `sale_ingest_batches` within that transaction, so
+    replaying the journal after a crash never applies a segment twice.
+
+    Every process journals into its own `worker-*` directory and holds an exclusive flock
+    on its lock file while running. Only directories whose lock can be acquired, i.e. whose
+    process has exited, are adopted and replayed at startup.
+    """
+
+    def __init__(self, directory=SALES_JOURNAL_DIR, flush_size=SALES_FLUSH_SIZE, flush_interval=SALES_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_size = max(flush_size, 1)
+        self.flush_interval = flush_interval
+        # Called with (sequence, applied sale events plus category_id) after each commit
+        self.listeners = []
+        # Sequence number of the last committed flush; only changes under the flush lock
+        self.applied_sequence = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._worker_dir = None
+        self._worker_lock = None
+        self._journal = None
+        self._segment = None
+        self._pending = 0
+        self._sealed = []
+        self._sealed_events = 0
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        get_engine()
+        self._create_worker_dir()
+        # Segments of exited processes were acknowledged but maybe not applied; replay them first
+        adopted = self._adopt_orphaned_segments()
+        for path in adopted:
+            self._sealed.append((path, _count_lines(path)))
+        self._sealed_events = sum(count for _, count in self._sealed)
+        if adopted:
+            metrics.incr("sales_buffer.replayed_segments", len(adopted))
+            print(f"Replaying {len(adopted)} sales journal segment(s)")
+        self._open_segment()
+        self.flush()
+        self._thread = threading.Thread(target=self._run, name="sale-buffer-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+                if self._pending == 0:
+                    os.remove(self._segment)
+            if self._worker_lock is not None:
+                if not self._pending and not self._sealed:
+                    # Nothing left to replay; otherwise the next process to start adopts the directory
+                    os.remove(os.path.join(self._worker_dir, LOCK_NAME))
+                    os.rmdir(self._worker_dir)
+                self._worker_lock.close()
+                self._worker_lock = None
+
+    def append(self, sale):
+        """
+        Durably journal one `schemas.SaleCreate` and return the current buffer depth
+        """
+        event = sale.model_dump()
+        event["sale_date"] = datetime.utcnow().isoformat()
+        line = json.dumps(event, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._journal is None:
+                raise RuntimeError("Sale buffer is not running")
+            self._journal.write(line)
+            self._journal.flush()
+            if SALES_JOURNAL_FSYNC:
+                os.fsync(self._journal.fileno())
+            self._pending += 1
+            depth = self._pending + self._sealed_events
+            if self._pending >= self.flush_size:
+                self._wakeup.set()
+        metrics.incr("sales_buffer.accepted")
+        metrics.set_gauge("sales_buffer.depth", depth)
+        return depth
+
+    def flush(self):
+        """
+        Seal the active segment and apply every sealed segment, oldest first
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._pending and self._journal is not None:
+                    self._journal.close()
+                    self._sealed.append((self._segment, self._pending))
+                    self._sealed_events += self._pending
+                    self._pending = 0
+                    self._open_segment()
+            while self._sealed:
+                path, count = self._sealed[0]
+                try:
+                    self._apply_segment(path)
+                except Exception as e:
+                    # Keep the segment on disk and retry on the next flush
+                    metrics.incr("sales_buffer.flush_errors")
+                    print(f"Error flushing sales journal segment {path}: {e}")
+                    break
+                os.remove(path)
+                with self._lock:
+                    self._sealed.pop(0)
+                    self._sealed_events -= count
+                    depth = self._pending + self._sealed_events
+                metrics.set_gauge("sales_buffer.depth", depth)
+
+    @contextmanager
+    def hold(self):
+        """
+        Block flushes, e.g. while taking a snapshot that must line up with `applied_sequence`
+        """
+        with self._flush_lock:
+            yield
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _create_worker_dir(self):
+        # Lock the directory before it becomes visible under its worker- name
+        name = uuid.uuid4().hex[:12]
+        staging = os.path.join(self.directory, f".{name}")
+        os.makedirs(staging)
+        self._worker_lock = open(os.path.join(staging, LOCK_NAME), "w")
+        fcntl.flock(self._worker_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._worker_dir = os.path.join(self.directory, f"{WORKER_PREFIX}{name}")
+        os.rename(staging, self._worker_dir)
+
+    def _adopt_orphaned_segments(self):
+        """
+        Move the segments of every unlocked worker directory into ours and return their paths
+        """
+        adopted = []
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if not name.startswith(WORKER_PREFIX) or path == self._worker_dir:
+                continue
+            try:
+                lock = open(os.path.join(path, LOCK_NAME), "r+")
+            except FileNotFoundError:
+                # Being cleaned up by another process
+                continue
+            with lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # The owning process is still running
+                    continue
+                try:
+                    segments = [segment for segment in os.listdir(path) if segment.endswith(".jsonl")]
+                except FileNotFoundError:
+                    continue
+                for segment in segments:
+                    # The name is the batch id, so it must survive the move
+                    target = os.path.join(self._worker_dir, segment)
+                    os.rename(os.path.join(path, segment), target)
+                    adopted.append(target)
+                try:
+                    os.remove(os.path.join(path, LOCK_NAME))
+                    os.rmdir(path)
+                except OSError:
+                    pass
+        return sorted(adopted, key=os.path.basename)
+
+    def _open_segment(self):
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.jsonl"
+        self._segment = os.path.join(self._worker_dir, name)
+        self._journal = open(self._segment, "a", encoding="utf-8")
+
+    def _apply_segment(self, path):
+        batch_id = os.path.basename(path)[:-len(".jsonl")]
+        with open(path, encoding="utf-8") as journal:
+            # A torn final line means the append was never acknowledged
+            events = []
+            for line in journal:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            if db.get(SaleIngestBatch, batch_id) is not None:
+                return
+
+            product_ids = {event["product_id"] for event in events}
+            categories = dict(
+                db.query(Product.id, Product.category_id).filter(Product.id.in_(product_ids)).all()
+            ) if product_ids else {}
+            accepted = [event for event in events if event["product_id"] in categories]
+            rejected = [event for event in events if event["product_id"] not in categories]
+
+            if accepted:
+                db.execute(insert(Sale), [
+                    {
+                        "product_id": event["product_id"],
+                        "quantity": event["quantity"],
+                        "total_price": event["total_price"],
+                        "sale_date": datetime.fromisoformat(event["sale_date"]),
+                        "platform": event.get("platform"),
+                    }
+                    for event in accepted
+                ])
+
+                sold = defaultdict(int)
+                for event in accepted:
+                    sold[event["product_id"]] += event["quantity"]
+                inventories = db.query(Inventory).filter(
+                    Inventory.product_id.in_(sold)
+                ).with_for_update().all()
+                for inventory in inventories:
+                    previous_quantity = inventory.quantity
+                    inventory.quantity = previous_quantity - sold[inventory.product_id]
+                    db.add(InventoryHistory(
+                        inventory_id=inventory.id,
+                        previous_quantity=previous_quantity,
+                        new_quantity=inventory.quantity
+                    ))
+
+            db.add(SaleIngestBatch(id=batch_id, sales_count=len(accepted)))
+            db.commit()
+            self.applied_sequence += 1
+            sequence = self.applied_sequence
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        metrics.incr("sales_buffer.flushed", len(accepted))
+        metrics.incr("sales_buffer.batches")
+        if rejected:
+            self._dead_letter(batch_id, rejected)
+            metrics.incr("sales_buffer.rejected", len(rejected))
+        metrics.set_gauge("sales_buffer.last_flush_seconds", round(time.perf_counter() - started, 6))
+        metrics.set_gauge("sales_buffer.last_flush_size", len(accepted))
+
+        if accepted and self.listeners:
+            for event in accepted:
+                event["category_id"] = categories[event["product_id"]]
+            for listener in self.listeners:
+                try:
+                    listener(sequence, accepted)
+                except Exception as e:
+                    print(f"Error notifying sale listener: {e}")
+
+    def _dead_letter(self, batch_id, events):
+        lines = "".join(
+            json.dumps(dict(event, batch_id=batch_id), separators=(",", ":")) + "\n" for event in events
+        )
+        with open(os.path.join(self.directory, DEAD_LETTER_NAME), "a", encoding="utf-8") as dead_letter:
+            dead_letter.write(lines)
+        print(f"Rejected {len(events)} sale(s) of unknown products from segment {batch_id}")
+
+
+def _count_lines(path):
+    with open(path, encoding="utf-8") as journal:
+        return sum(1 for _ in journal)
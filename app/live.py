@@ -0,0 +1,280 @@
+import os
+import asyncio
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from . import metrics
+from .database import SessionLocal, get_engine, Sale, Product
+
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "100"))
+# Seconds between refreshes of every live window from the database; 0 disables
+LIVE_RESYNC_INTERVAL = float(os.getenv("LIVE_RESYNC_INTERVAL", "30"))
+GRAINS = ("day", "week", "month")
+
+
+def period_bounds(grain, moment):
+    """
+    Return (label, start, end) of the calendar period containing `moment`
+
+    Labels follow the formats of the /sales/daily, /sales/weekly and /sales/monthly summaries.
+    """
+    day = datetime(moment.year, moment.month, moment.day)
+    if grain == "day":
+        return day.strftime("%Y-%m-%d"), day, day + timedelta(days=1)
+    if grain == "week":
+        start = day - timedelta(days=day.weekday())
+        end = start + timedelta(days=7)
+        return f"{start.strftime('%Y-%m-%d')} to {end.strftime('%Y-%m-%d')}", start, end
+    start = datetime(day.year, day.month, 1)
+    end = datetime(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return f"{start.year}-{start.month:02d}", start, end
+
+
+class _Topic:
+    """
+    Aggregation state for one (grain, platform, category_id), shared by all its subscribers
+    """
+
+    def __init__(self, key, summary, sequence=0):
+        self.key = key
+        self.summary = summary
+        # Flushes up to this buffer sequence number are already part of the summary
+        self.sequence = sequence
+        self.subscribers = set()
+
+    def snapshot_message(self):
+        return {"type": "snapshot", "grain": self.key[0], "summary": dict(self.summary)}
+
+
+class Subscription:
+    def __init__(self, topic):
+        self.topic = topic
+        self.queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+
+    def offer(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Slow consumer: drop its backlog and resynchronise it with one snapshot
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(self.topic.snapshot_message())
+            metrics.incr("live.resyncs")
+
+
+class LiveFeed:
+    """
+    Fan-out of sale deltas to WebSocket subscribers
+
+    Sales arrive from the write-behind buffer's flush thread through `publish`; each topic's
+    window is updated once per flush and the same message is queued for every subscriber.
+    Only sales buffered by this process are seen: with several workers, each one's feed
+    streams its own sales on top of the snapshot taken from the database. Every
+    `resync_interval` seconds all windows are therefore rebuilt from the database, which
+    also rolls them over when no sale arrives at a period boundary.
+    """
+
+    def __init__(self, resync_interval=LIVE_RESYNC_INTERVAL):
+        self.resync_interval = resync_interval
+        self._topics = {}
+        self._loop = None
+        self._buffer = None
+        self._resync_task = None
+        self._lock = threading.Lock()
+
+    def attach(self, loop, buffer=None):
+        self._loop = loop
+        self._buffer = buffer
+        if buffer is not None:
+            buffer.listeners.append(self.publish)
+        if self.resync_interval > 0:
+            self._resync_task = loop.create_task(self._resync_periodically())
+
+    def detach(self):
+        if self._resync_task is not None:
+            self._resync_task.cancel()
+            self._resync_task = None
+        if self._buffer is not None and self.publish in self._buffer.listeners:
+            self._buffer.listeners.remove(self.publish)
+        self._loop = None
+        self._buffer = None
+
+    async def subscribe(self, grain, platform=None, category_id=None):
+        key = (grain, platform, category_id)
+        topic = self._topics.get(key)
+        if topic is None:
+            # Hold flushes so that no committed sale is both in the snapshot and in a later delta
+            loop = asyncio.get_running_loop()
+            topic = await loop.run_in_executor(None, self._create_topic, key)
+        elif topic.summary["period"] != period_bounds(grain, datetime.utcnow())[0]:
+            # The period ended since the last sale or resync; do not serve the old window
+            await self.refresh([key])
+        subscription = Subscription(topic)
+        topic.subscribers.add(subscription)
+        subscription.offer(topic.snapshot_message())
+        metrics.set_gauge("live.subscribers", self._subscriber_count())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        topic = subscription.topic
+        topic.subscribers.discard(subscription)
+        with self._lock:
+            if not topic.subscribers and self._topics.get(topic.key) is topic:
+                del self._topics[topic.key]
+        metrics.set_gauge("live.subscribers", self._subscriber_count())
+
+    def publish(self, sequence, sales):
+        """
+        Thread-safe entry point for the sale events of flush number `sequence`
+        """
+        loop = self._loop
+        if loop is not None and self._topics:
+            loop.call_soon_threadsafe(self._apply, sequence, sales)
+
+    def _create_topic(self, key):
+        hold = self._buffer.hold() if self._buffer is not None else nullcontext()
+        with hold:
+            with self._lock:
+                topic = self._topics.get(key)
+                if topic is None:
+                    # With flushes held, every flush up to applied_sequence is committed and in
+                    # the snapshot, even if its _apply is still queued on the event loop
+                    sequence = self._buffer.applied_sequence if self._buffer is not None else 0
+                    topic = _Topic(key, self._current_summary(*key), sequence)
+                    self._topics[key] = topic
+                return topic
+
+    async def refresh(self, keys):
+        """
+        Rebuild the windows of `keys` from the database and send changed ones as snapshots
+        """
+        loop = asyncio.get_running_loop()
+        replaced = loop.create_future()
+        await loop.run_in_executor(None, self._snapshot, loop, keys, replaced)
+        await replaced
+
+    def _snapshot(self, loop, keys, replaced):
+        hold = self._buffer.hold() if self._buffer is not None else nullcontext()
+        with hold:
+            sequence = self._buffer.applied_sequence if self._buffer is not None else 0
+            summaries = {key: self._current_summary(*key) for key in keys}
+            # Scheduled while flushes are held: every _apply of a flush in the snapshot is
+            # already queued ahead of the replacement, every later one is queued behind it
+            loop.call_soon_threadsafe(self._replace_summaries, sequence, summaries, replaced)
+
+    def _replace_summaries(self, sequence, summaries, replaced):
+        for key, summary in summaries.items():
+            topic = self._topics.get(key)
+            if topic is None:
+                continue
+            changed = _differs(topic.summary, summary)
+            topic.summary = summary
+            topic.sequence = sequence
+            if changed:
+                message = topic.snapshot_message()
+                for subscription in list(topic.subscribers):
+                    subscription.offer(message)
+                metrics.incr("live.refreshed_windows")
+        if not replaced.done():
+            replaced.set_result(None)
+
+    async def _resync_periodically(self):
+        while True:
+            await asyncio.sleep(self.resync_interval)
+            keys = list(self._topics)
+            if not keys:
+                continue
+            try:
+                await self.refresh(keys)
+            except Exception as e:
+                print(f"Error refreshing live sales windows: {e}")
+
+    def _current_summary(self, grain, platform, category_id):
+        label, start, end = period_bounds(grain, datetime.utcnow())
+        get_engine()
+        db = SessionLocal()
+        try:
+            query = db.query(
+                func.count(Sale.id),
+                func.coalesce(func.sum(Sale.total_price), 0.0),
+                func.coalesce(func.sum(Sale.quantity), 0),
+            ).filter(Sale.sale_date >= start, Sale.sale_date < end)
+            if platform:
+                query = query.filter(Sale.platform == platform)
+            if category_id:
+                query = query.join(Product, Sale.product_id == Product.id).filter(
+                    Product.category_id == category_id
+                )
+            total_sales, total_revenue, products_sold = query.one()
+        finally:
+            db.close()
+        return {
+            "period": label,
+            "total_sales": int(total_sales),
+            "total_revenue": float(total_revenue),
+            "products_sold": int(products_sold),
+        }
+
+    def _apply(self, sequence, sales):
+        for topic in list(self._topics.values()):
+            if sequence <= topic.sequence:
+                continue
+            topic.sequence = sequence
+            grain, platform, category_id = topic.key
+            deltas = {}
+            for sale in sales:
+                if platform and sale.get("platform") != platform:
+                    continue
+                if category_id and sale.get("category_id") != category_id:
+                    continue
+                label, _, _ = period_bounds(grain, datetime.fromisoformat(sale["sale_date"]))
+                delta = deltas.setdefault(label, [0, 0.0, 0])
+                delta[0] += 1
+                delta[1] += sale["total_price"]
+                delta[2] += sale["quantity"]
+
+            for label in sorted(deltas):
+                total_sales, total_revenue, products_sold = deltas[label]
+                if label < topic.summary["period"]:
+                    continue
+                if label > topic.summary["period"]:
+                    # The window rolled over: start the new one from zero and announce it
+                    topic.summary = {
+                        "period": label,
+                        "total_sales": total_sales,
+                        "total_revenue": total_revenue,
+                        "products_sold": products_sold,
+                    }
+                    message = topic.snapshot_message()
+                else:
+                    topic.summary["total_sales"] += total_sales
+                    topic.summary["total_revenue"] += total_revenue
+                    topic.summary["products_sold"] += products_sold
+                    message = {
+                        "type": "delta",
+                        "period": label,
+                        "total_sales": total_sales,
+                        "total_revenue": total_revenue,
+                        "products_sold": products_sold,
+                    }
+                for subscription in list(topic.subscribers):
+                    subscription.offer(message)
+                metrics.incr("live.messages", len(topic.subscribers))
+
+    def _subscriber_count(self):
+        return sum(len(topic.subscribers) for topic in list(self._topics.values()))
+
+
+def _differs(old, new):
+    return (
+        old["period"] != new["period"]
+        or old["total_sales"] != new["total_sales"]
+        or old["products_sold"] != new["products_sold"]
+        or abs(old["total_revenue"] - new["total_revenue"]) > 1e-6
+    )
+
+
+live_feed = LiveFeed()
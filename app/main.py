@@ -1,37 +1,103 @@
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import os
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, configure_mappers
+from sqlalchemy.sql import text
 
-from .database import engine, Base, get_db
+from . import metrics
+from .analytics import pool as analytics_pool
+from .compression import CompressionMiddleware
+from .ingest import SaleBuffer, SALES_BUFFER_ENABLED
+from .live import live_feed
+from .checkpoints import CheckpointScheduler
+from .database import get_db, get_engine, dispose_engine, init_db, warm_pool
 from .routers import sales, inventory, products
 
-Base.metadata.create_all(bind=engine)
-app = FastAPI(
-    title="E-commerce Admin API (Forsit Test)",
-    description="API for e-commerce admin dashboard (Forsit Test)",
-    version="0.1.0",
-)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
-app.include_router(sales.router)
-app.include_router(inventory.router)
-app.include_router(products.router)
-
-@app.get("/")
-def read_root():
-    return {"message": "Welcome to E-commerce Admin API (Forsit Test)"}
-
-@app.get("/health")
-def health_check(db: Session = Depends(get_db)):
-    try:
-        db.execute("SELECT 1")
-        return {"status": "healthy", "database": "connected"}
-    except Exception as e:
-        return {"status": "unhealthy", "database": str(e)}
\ No newline at end of file
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+# Startup behaviour, all opt-in so that importing or booting a worker stays cheap
+DB_CREATE_SCHEMA = os.getenv("DB_CREATE_SCHEMA", "false").lower() == "true"
+DB_WARM_POOL = int(os.getenv("DB_WARM_POOL", "0"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    get_engine()
+    if DB_CREATE_SCHEMA:
+        init_db()
+    # Mappers are configured lazily on first query; do it here instead of in the first request
+    configure_mappers()
+    warmed = warm_pool(DB_WARM_POOL) if DB_WARM_POOL > 0 else 0
+    app.state.sale_buffer = None
+    if SALES_BUFFER_ENABLED:
+        app.state.sale_buffer = SaleBuffer()
+        app.state.sale_buffer.start()
+    live_feed.attach(asyncio.get_running_loop(), app.state.sale_buffer)
+    app.state.checkpoints = CheckpointScheduler()
+    app.state.checkpoints.start()
+
+    ready_seconds = time.perf_counter() - started
+    metrics.set_gauge("startup.import_seconds", round(IMPORT_SECONDS, 6))
+    metrics.set_gauge("startup.ready_seconds", round(ready_seconds, 6))
+    metrics.set_gauge("startup.warm_connections", warmed)
+    print(f"Startup: import {IMPORT_SECONDS * 1000:.1f} ms, ready {ready_seconds * 1000:.1f} ms")
+    yield
+    app.state.checkpoints.stop()
+    live_feed.detach()
+    if app.state.sale_buffer is not None:
+        app.state.sale_buffer.stop()
+    analytics_pool.shutdown()
+    dispose_engine()
+
+
+def create_app():
+    """
+    Build the FastAPI application; no database work happens until the lifespan starts
+    """
+    app = FastAPI(
+        title="E-commerce Admin API (Forsit Test)",
+        description="API for e-commerce admin dashboard (Forsit Test)",
+        version="0.1.0",
+        lifespan=lifespan,
+    )
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(CompressionMiddleware)
+
+    app.include_router(sales.router)
+    app.include_router(inventory.router)
+    app.include_router(products.router)
+
+    @app.get("/")
+    def read_root():
+        return {"message": "Welcome to E-commerce Admin API (Forsit Test)"}
+
+    @app.get("/health")
+    def health_check(db: Session = Depends(get_db)):
+        try:
+            db.execute(text("SELECT 1"))
+            return {"status": "healthy", "database": "connected"}
+        except Exception as e:
+            return {"status": "unhealthy", "database": str(e)}
+
+    @app.get("/metrics")
+    def get_metrics():
+        return metrics.snapshot()
+
+    return app
+
+
+app = create_app()
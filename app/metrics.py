@@ -0,0 +1,29 @@
+import threading
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+
+
+def incr(name, value=1):
+    """
+    Increase a monotonically growing counter
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name, value):
+    """
+    Record the latest value of a gauge
+    """
+    with _lock:
+        _gauges[name] = value
+
+
+def snapshot():
+    """
+    Return a copy of all counters and gauges
+    """
+    with _lock:
+        return {"counters": dict(_counters), "gauges": dict(_gauges)}
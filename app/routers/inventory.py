@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime
+from datetime import datetime, timezone
 
 from .. import schemas
-from .. database import get_db, Inventory, InventoryHistory, Product
+from .. checkpoints import inventory_as_of
+from .. singleflight import coalesced
+from .. database import get_db, get_read_db, Inventory, InventoryHistory, Product
 
 router = APIRouter(
     prefix="/inventory",
@@ -16,7 +18,7 @@ router = APIRouter(
 def get_inventory(
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get current inventory status for all products
@@ -25,7 +27,8 @@ def get_inventory(
     return inventory
 
 @router.get("/low-stock", response_model=List[schemas.LowStockProduct])
-def get_low_stock(db: Session = Depends(get_db)):
+@coalesced
+def get_low_stock(db: Session = Depends(get_read_db)):
     """
     Get products with inventory below the low stock threshold
     """
@@ -47,6 +50,26 @@ def get_low_stock(db: Session = Depends(get_db)):
         ) for item in low_stock_items
     ]
 
+@router.get("/as-of", response_model=schemas.InventoryAsOf)
+def get_inventory_as_of(
+    ts: datetime = Query(..., description="Point in time to reconstruct stock levels for"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get the stock level of every product at a point in time
+    """
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    checkpoint, items = inventory_as_of(db, ts)
+    return schemas.InventoryAsOf(
+        as_of=ts,
+        checkpoint_taken_at=checkpoint.taken_at if checkpoint else None,
+        items=[
+            schemas.InventoryAsOfItem(product_id=product_id, product_name=product_name, quantity=quantity)
+            for product_id, product_name, quantity in items
+        ]
+    )
+
 @router.put("/{product_id}", response_model=schemas.Inventory)
 def update_inventory(
     product_id: int = Path(..., description="The ID of the product to update"),
@@ -82,7 +105,7 @@ def update_inventory(
 def get_inventory_history(
     product_id: int = Path(..., description="The ID of the product"),
     limit: int = Query(10, description="Number of history records to retrieve"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get inventory change history for a product
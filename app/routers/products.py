@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Path
-from sqlalchemy.orm import Session
-from typing import List
+import json
+import anyio
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, contains_eager, joinedload
+from typing import List, Optional
 
 from .. import schemas
-from .. database import get_db, Product, Category, Inventory
+from .. catalog_import import CatalogImporter, iter_lines, FORMATS, IMPORT_CHUNK_SIZE
+from .. database import get_db, get_read_db, Product, Category, Inventory
 
 router = APIRouter(
     prefix="/products",
@@ -11,11 +17,40 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+MAX_BATCH_IDS = 500
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+class _ImportProgressResponse(StreamingResponse):
+    """
+    Stream progress lines while the import is still reading the request body
+
+    StreamingResponse listens for disconnects on `receive`, which would swallow body chunks.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+def _body_chunks(request):
+    """
+    Iterate the request body from a worker thread, one received chunk at a time
+    """
+    stream = request.stream()
+    while True:
+        try:
+            yield anyio.from_thread.run(stream.__anext__)
+        except StopAsyncIteration:
+            return
+
 @router.get("/", response_model=List[schemas.Product])
 def get_products(
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all products with pagination
@@ -23,10 +58,48 @@ def get_products(
     products = db.query(Product).offset(skip).limit(limit).all()
     return products
 
+@router.get("/batch", response_model=List[schemas.ProductDetail])
+def get_products_batch(
+    ids: List[str] = Query(..., description="Product IDs, comma-separated or repeated"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get many products by ID in one query; unknown IDs are skipped
+    """
+    try:
+        product_ids = [int(value) for raw in ids for value in raw.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be integers")
+    product_ids = list(dict.fromkeys(product_ids))
+    if len(product_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    if not product_ids:
+        return []
+    products = db.query(Product).options(joinedload(Product.category)).filter(
+        Product.id.in_(product_ids)
+    ).all()
+    by_id = {product.id: product for product in products}
+    return [by_id[product_id] for product_id in product_ids if product_id in by_id]
+
+@router.get("/with-inventory", response_model=List[schemas.ProductWithInventory])
+def get_products_with_inventory(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get products with their category and stock level in one joined query
+    """
+    products = db.query(Product).join(Product.category).outerjoin(Product.inventory).options(
+        contains_eager(Product.category),
+        contains_eager(Product.inventory)
+    ).order_by(Product.id).offset(skip).limit(limit).all()
+    return products
+
 @router.get("/{product_id}", response_model=schemas.ProductDetail)
 def get_product(
     product_id: int = Path(..., description="The ID of the product to get"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get a specific product by ID
@@ -66,6 +139,57 @@ def create_product(
     
     return db_product
 
+@router.post("/import", response_model=schemas.CatalogImportReport)
+async def import_products(
+    request: Request,
+    format: Optional[str] = Query(None, description="csv or ndjson; defaults to the Content-Type"),
+    chunk_size: int = Query(IMPORT_CHUNK_SIZE, gt=0, description="Rows per batch/transaction"),
+    progress: bool = Query(False, description="Stream an NDJSON progress line per chunk, then the report"),
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk upsert products, categories and initial inventory from a streamed CSV/NDJSON body
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        format = IMPORT_CONTENT_TYPES.get(content_type)
+    if format not in FORMATS:
+        raise HTTPException(
+            status_code=415, detail="Send text/csv or application/x-ndjson, or pass format=csv|ndjson"
+        )
+
+    def run_import(on_progress=None):
+        importer = CatalogImporter(db, chunk_size=chunk_size, on_progress=on_progress)
+        return importer.run(iter_lines(_body_chunks(request)), format)
+
+    if not progress:
+        return await run_in_threadpool(run_import)
+
+    loop = asyncio.get_running_loop()
+    updates = asyncio.Queue()
+
+    def on_progress(report):
+        update = {key: value for key, value in report.items() if key != "errors"}
+        loop.call_soon_threadsafe(updates.put_nowait, dict(update, done=False))
+
+    def run_import_with_progress():
+        try:
+            return run_import(on_progress)
+        finally:
+            loop.call_soon_threadsafe(updates.put_nowait, None)
+
+    async def stream():
+        task = asyncio.ensure_future(run_in_threadpool(run_import_with_progress))
+        while True:
+            update = await updates.get()
+            if update is None:
+                break
+            yield json.dumps(update) + "\n"
+        report = await task
+        yield json.dumps(dict(report, done=True)) + "\n"
+
+    return _ImportProgressResponse(stream(), media_type="application/x-ndjson")
+
 @router.put("/{product_id}", response_model=schemas.Product)
 def update_product(
     product_id: int,
@@ -118,16 +242,18 @@ def get_products_by_category(
     category_id: int,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get products by category
     """
-    category = db.query(Category).filter(Category.id == category_id).first()
-    if not category:
-        raise HTTPException(status_code=404, detail="Category not found")
     products = db.query(Product).filter(
         Product.category_id == category_id
     ).offset(skip).limit(limit).all()
+    # Only pay for the existence check when there is nothing to return
+    if not products:
+        category = db.query(Category.id).filter(Category.id == category_id).first()
+        if not category:
+            raise HTTPException(status_code=404, detail="Category not found")
     
     return products
\ No newline at end of file
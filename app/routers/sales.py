@@ -1,54 +1,263 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 from .. import schemas
-from .. database import get_db, Sale, Product, Category
+from .. archive import archive, get_watermark, archived_summary, archived_daily_totals
+from .. live import live_feed, GRAINS
+from .. singleflight import coalesced
+from .. database import get_db, get_read_db, Sale, Product, Category
 from sqlalchemy.sql import text
 
+ONE_MICROSECOND = timedelta(microseconds=1)
+
 router = APIRouter(
     prefix="/sales",
     tags=["sales"],
     responses={404: {"description": "Not found"}},
 )
 
+# Columns selectable through the `fields` parameter of the list endpoints
+SALE_FIELDS = {
+    "id": Sale.id,
+    "product_id": Sale.product_id,
+    "quantity": Sale.quantity,
+    "total_price": Sale.total_price,
+    "sale_date": Sale.sale_date,
+    "platform": Sale.platform,
+}
+PRODUCT_FIELDS = {
+    "id": Product.id,
+    "name": Product.name,
+    "description": Product.description,
+    "price": Product.price,
+    "category_id": Product.category_id,
+    "created_at": Product.created_at,
+    "updated_at": Product.updated_at,
+}
+FIELDS_DESCRIPTION = (
+    "Comma-separated columns to return, e.g. sale_date,total_price or product.name; "
+    "omit for full SaleDetail objects"
+)
+
+def _parse_fields(fields):
+    """
+    Split a `fields` parameter into sale and product column names
+    """
+    sale_fields, product_fields = [], []
+    for name in dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()):
+        if name.startswith("product.") and name[len("product."):] in PRODUCT_FIELDS:
+            product_fields.append(name[len("product."):])
+        elif name in SALE_FIELDS:
+            sale_fields.append(name)
+        else:
+            raise HTTPException(status_code=422, detail=f"Unknown field: {name}")
+    if not sale_fields and not product_fields:
+        raise HTTPException(status_code=422, detail="fields must name at least one column")
+    return sale_fields, product_fields
+
+def _projected_rows(query, skip, limit, sale_fields, product_fields, product_joined=False):
+    """
+    Run `query` selecting only the requested columns and return rows as plain dicts
+    """
+    columns = [SALE_FIELDS[name] for name in sale_fields]
+    columns += [PRODUCT_FIELDS[name].label(f"product_{name}") for name in product_fields]
+    # Join while sales is still the selected entity: with only product columns selected,
+    # products would become the left side and the join would have nothing to start from
+    if product_fields and not product_joined:
+        query = query.join(Product, Sale.product_id == Product.id)
+    query = query.with_entities(*columns)
+
+    items = []
+    for row in query.offset(skip).limit(limit).all():
+        item = {name: row[i] for i, name in enumerate(sale_fields)}
+        if product_fields:
+            offset = len(sale_fields)
+            item["product"] = {name: row[offset + i] for i, name in enumerate(product_fields)}
+        items.append(item)
+    return items
+
+def _archived_sales(db, query, skip, limit, hot_count, start=None, end=None, product_ids=None, platform=None):
+    """
+    Continue a page of hot sales with archived ones; archived rows follow all hot rows
+    """
+    if hot_count >= limit or (product_ids is not None and not product_ids):
+        return []
+    watermark = get_watermark(db)
+    if watermark is None or (start is not None and start >= watermark):
+        return []
+    if hot_count:
+        archive_skip = 0
+    else:
+        archive_skip = max(skip - query.order_by(None).count(), 0)
+    end = min(end, watermark) if end is not None else watermark
+    return archive.find(start, end, product_ids, platform, archive_skip, limit - hot_count)
+
+def _list_sales(db, query, skip, limit, fields, product_joined=False, **archive_filters):
+    """
+    Page through hot and archived sales, as SaleDetail objects or projected to `fields`
+    """
+    if fields:
+        sale_fields, product_fields = _parse_fields(fields)
+        items = _projected_rows(query, skip, limit, sale_fields, product_fields, product_joined)
+    else:
+        items = query.options(joinedload(Sale.product)).offset(skip).limit(limit).all()
+
+    archived = _archived_sales(db, query, skip, limit, len(items), **archive_filters)
+    if archived:
+        product_ids = {row["product_id"] for row in archived}
+        if fields:
+            products = {}
+            if product_fields:
+                columns = [Product.id] + [PRODUCT_FIELDS[name] for name in product_fields]
+                for row in db.query(*columns).filter(Product.id.in_(product_ids)):
+                    products[row[0]] = dict(zip(product_fields, row[1:]))
+            for row in archived:
+                item = {name: row[name] for name in sale_fields}
+                if product_fields:
+                    item["product"] = products.get(row["product_id"])
+                items.append(item)
+        else:
+            products = {
+                product.id: product
+                for product in db.query(Product).filter(Product.id.in_(product_ids))
+            }
+            for row in archived:
+                if row["product_id"] in products:
+                    items.append(dict(row, product=products[row["product_id"]]))
+
+    if fields:
+        return JSONResponse(jsonable_encoder(items))
+    return items
+
+def _period_summary(db, start, end, watermark):
+    """
+    (total_sales, total_revenue, products_sold) for start <= sale_date < end, hot and archived
+    """
+    total_sales, total_revenue, products_sold = db.query(
+        func.count(Sale.id),
+        func.coalesce(func.sum(Sale.total_price), 0.0),
+        func.coalesce(func.sum(Sale.quantity), 0),
+    ).filter(
+        Sale.sale_date >= start,
+        Sale.sale_date < end
+    ).one()
+    archived_sales, archived_revenue, archived_sold = archived_summary(db, start, end, watermark)
+    return (
+        int(total_sales) + archived_sales,
+        float(total_revenue) + archived_revenue,
+        int(products_sold) + archived_sold,
+    )
+
+def _midnight(day):
+    return datetime(day.year, day.month, day.day)
+
+def _as_date(value):
+    """
+    DATE() comes back as a date from MySQL but as an ISO string from SQLite
+    """
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
 @router.get("/", response_model=List[schemas.SaleDetail])
 def get_sales(
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all sales records with pagination
     """
-    sales = db.query(Sale).offset(skip).limit(limit).all()
-    return sales
+    query = db.query(Sale)
+    return _list_sales(db, query, skip, limit, fields)
+
+@router.post("/", response_model=schemas.SaleAccepted, status_code=202)
+def record_sale(sale: schemas.SaleCreate, request: Request, db: Session = Depends(get_db)):
+    """
+    Record a sale; it is journaled immediately and written to the database in the next batch
+    """
+    if sale.quantity <= 0:
+        raise HTTPException(status_code=422, detail="Quantity must be positive")
+    buffer = getattr(request.app.state, "sale_buffer", None)
+    if buffer is None:
+        raise HTTPException(status_code=503, detail="Sale ingestion is disabled")
+    if db.query(Product.id).filter(Product.id == sale.product_id).first() is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    depth = buffer.append(sale)
+    return schemas.SaleAccepted(status="accepted", buffered=depth)
+
+@router.websocket("/live")
+async def live_sales(
+    websocket: WebSocket,
+    grain: str = Query("day", description="Window size: day, week or month"),
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None
+):
+    """
+    Stream the current sales window once, then deltas as sales are recorded
+    """
+    if grain not in GRAINS:
+        await websocket.close(code=1008, reason=f"grain must be one of {', '.join(GRAINS)}")
+        return
+    await websocket.accept()
+    subscription = await live_feed.subscribe(grain, platform, category_id)
+
+    async def forward():
+        while True:
+            await websocket.send_json(await subscription.queue.get())
+
+    async def wait_for_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.ensure_future(forward()), asyncio.ensure_future(wait_for_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        live_feed.unsubscribe(subscription)
 
 @router.get("/daily", response_model=List[schemas.SaleSummary])
+@coalesced
 def get_daily_sales(
     days: int = Query(7, description="Number of days to analyze"), 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get daily sales summary for the last specified number of days
     """
-    results = []
     today = datetime.utcnow().date()
-    
+    window_start = today - timedelta(days=days - 1)
+    sale_day = func.date(Sale.sale_date)
+    hot = {
+        _as_date(day): (int(total_sales), float(total_revenue), int(products_sold))
+        for day, total_sales, total_revenue, products_sold in db.query(
+            sale_day,
+            func.count(Sale.id),
+            func.coalesce(func.sum(Sale.total_price), 0.0),
+            func.coalesce(func.sum(Sale.quantity), 0),
+        ).filter(
+            Sale.sale_date >= window_start,
+            Sale.sale_date < today + timedelta(days=1)
+        ).group_by(sale_day)
+    }
+    archived = archived_daily_totals(db, window_start, today + timedelta(days=1), get_watermark(db))
+
+    results = []
     for i in range(days):
         target_date = today - timedelta(days=i)
-        next_date = target_date + timedelta(days=1)
-        day_sales = db.query(Sale).filter(
-            Sale.sale_date >= target_date,
-            Sale.sale_date < next_date
-        ).all()
-
-        total_sales = len(day_sales)
-        total_revenue = sum(sale.total_price for sale in day_sales)
-        products_sold = sum(sale.quantity for sale in day_sales)
-        
+        total_sales, total_revenue, products_sold = hot.get(target_date, (0, 0.0, 0))
+        if target_date in archived:
+            archived_sales, archived_revenue, archived_sold = archived[target_date]
+            total_sales += archived_sales
+            total_revenue += archived_revenue
+            products_sold += archived_sold
         results.append(
             schemas.SaleSummary(
                 period=target_date.strftime("%Y-%m-%d"),
@@ -61,28 +270,25 @@ def get_daily_sales(
     return results
 
 @router.get("/weekly", response_model=List[schemas.SaleSummary])
+@coalesced
 def get_weekly_sales(
     weeks: int = Query(4, description="Number of weeks to analyze"), 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get weekly sales summary for the last specified number of weeks
     """
     results = []
     today = datetime.utcnow().date()
+    watermark = get_watermark(db)
     
     for i in range(weeks):
         end_date = today - timedelta(days=i*7)
         start_date = end_date - timedelta(days=7)
         
-        week_sales = db.query(Sale).filter(
-            Sale.sale_date >= start_date,
-            Sale.sale_date < end_date
-        ).all()
-
-        total_sales = len(week_sales)
-        total_revenue = sum(sale.total_price for sale in week_sales)
-        products_sold = sum(sale.quantity for sale in week_sales)
+        total_sales, total_revenue, products_sold = _period_summary(
+            db, _midnight(start_date), _midnight(end_date), watermark
+        )
         
         results.append(
             schemas.SaleSummary(
@@ -96,9 +302,10 @@ def get_weekly_sales(
     return results
 
 @router.get("/monthly", response_model=List[schemas.SaleSummary])
+@coalesced
 def get_monthly_sales(
     months: int = Query(6, description="Number of months to analyze"), 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get monthly sales summary for the last specified number of months
@@ -107,6 +314,7 @@ def get_monthly_sales(
     today = datetime.utcnow().date()
     current_month = today.month
     current_year = today.year
+    watermark = get_watermark(db)
     
     for i in range(months):
         target_month = current_month - i
@@ -116,14 +324,11 @@ def get_monthly_sales(
             target_month += 12
             target_year -= 1
         
-        month_sales = db.query(Sale).filter(
-            extract('year', Sale.sale_date) == target_year,
-            extract('month', Sale.sale_date) == target_month
-        ).all()
-
-        total_sales = len(month_sales)
-        total_revenue = sum(sale.total_price for sale in month_sales)
-        products_sold = sum(sale.quantity for sale in month_sales)
+        month_start = datetime(target_year, target_month, 1)
+        month_end = datetime(target_year + target_month // 12, target_month % 12 + 1, 1)
+        total_sales, total_revenue, products_sold = _period_summary(
+            db, month_start, month_end, watermark
+        )
         
         results.append(
             schemas.SaleSummary(
@@ -137,26 +342,24 @@ def get_monthly_sales(
     return results
 
 @router.get("/annual", response_model=List[schemas.SaleSummary])
+@coalesced
 def get_annual_sales(
     years: int = Query(3, description="Number of years to analyze"), 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get annual sales summary for the last specified number of years
     """
     results = []
     current_year = datetime.utcnow().year
+    watermark = get_watermark(db)
     
     for i in range(years):
         target_year = current_year - i
         
-        year_sales = db.query(Sale).filter(
-            extract('year', Sale.sale_date) == target_year
-        ).all()
-
-        total_sales = len(year_sales)
-        total_revenue = sum(sale.total_price for sale in year_sales)
-        products_sold = sum(sale.quantity for sale in year_sales)
+        total_sales, total_revenue, products_sold = _period_summary(
+            db, datetime(target_year, 1, 1), datetime(target_year + 1, 1, 1), watermark
+        )
         
         results.append(
             schemas.SaleSummary(
@@ -170,34 +373,25 @@ def get_annual_sales(
     return results
 
 @router.get("/comparison", response_model=schemas.SalesComparison)
+@coalesced
 def compare_sales_periods(
     period1_start: datetime = Query(..., description="Start date of first period"),
     period1_end: datetime = Query(..., description="End date of first period"),
     period2_start: datetime = Query(..., description="Start date of second period"),
     period2_end: datetime = Query(..., description="End date of second period"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Compare sales between two time periods
     """
-
-    period1_sales = db.query(Sale).filter(
-        Sale.sale_date >= period1_start,
-        Sale.sale_date <= period1_end
-    ).all()
-    
-    period2_sales = db.query(Sale).filter(
-        Sale.sale_date >= period2_start,
-        Sale.sale_date <= period2_end
-    ).all()
-    
-    period1_total_sales = len(period1_sales)
-    period1_total_revenue = sum(sale.total_price for sale in period1_sales)
-    period1_products_sold = sum(sale.quantity for sale in period1_sales)
-
-    period2_total_sales = len(period2_sales)
-    period2_total_revenue = sum(sale.total_price for sale in period2_sales)
-    period2_products_sold = sum(sale.quantity for sale in period2_sales)
+    # Period ends are inclusive; _period_summary works with half-open ranges
+    watermark = get_watermark(db)
+    period1_total_sales, period1_total_revenue, period1_products_sold = _period_summary(
+        db, period1_start, period1_end + ONE_MICROSECOND, watermark
+    )
+    period2_total_sales, period2_total_revenue, period2_products_sold = _period_summary(
+        db, period2_start, period2_end + ONE_MICROSECOND, watermark
+    )
     
     change_percentage = 0
     if period1_total_revenue > 0:
@@ -228,7 +422,8 @@ def filter_sales(
     platform: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_read_db)
 ):
     """
     Filter sales by date range, product, category, or platform
@@ -250,5 +445,18 @@ def filter_sales(
     if platform:
         query = query.filter(Sale.platform == platform)
     
-    sales = query.offset(skip).limit(limit).all()
-    return sales
\ No newline at end of file
+    product_ids = {product_id} if product_id else None
+    if category_id:
+        category_product_ids = {
+            row[0] for row in db.query(Product.id).filter(Product.category_id == category_id)
+        }
+        product_ids = category_product_ids if product_ids is None else product_ids & category_product_ids
+    
+    return _list_sales(
+        db, query, skip, limit, fields,
+        product_joined=bool(category_id),
+        start=start_date,
+        end=end_date + ONE_MICROSECOND if end_date else None,
+        product_ids=product_ids,
+        platform=platform
+    )
\ No newline at end of file
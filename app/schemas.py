@@ -45,6 +45,34 @@ class ProductDetail(Product):
     class Config:
         orm_mode = True
 
+class InventoryStock(BaseModel):
+    quantity: int
+    low_stock_threshold: int
+    last_updated: datetime
+    
+    class Config:
+        orm_mode = True
+
+class ProductWithInventory(ProductDetail):
+    inventory: Optional[InventoryStock] = None
+    
+    class Config:
+        orm_mode = True
+
+class CatalogImportError(BaseModel):
+    line: int
+    error: str
+
+class CatalogImportReport(BaseModel):
+    rows: int
+    inserted: int
+    updated: int
+    categories_created: int
+    error_count: int
+    errors: List[CatalogImportError]
+    elapsed_seconds: float
+    rows_per_second: float
+
 # Inventory schemas
 class InventoryBase(BaseModel):
     product_id: int
@@ -83,6 +111,16 @@ class InventoryHistory(InventoryHistoryBase):
     class Config:
         orm_mode = True
 
+class InventoryAsOfItem(BaseModel):
+    product_id: int
+    product_name: str
+    quantity: int
+
+class InventoryAsOf(BaseModel):
+    as_of: datetime
+    checkpoint_taken_at: Optional[datetime] = None
+    items: List[InventoryAsOfItem]
+
 # Sale schemas
 class SaleBase(BaseModel):
     product_id: int
@@ -106,6 +144,10 @@ class SaleDetail(Sale):
     class Config:
         orm_mode = True
 
+class SaleAccepted(BaseModel):
+    status: str
+    buffered: int
+
 # Analysis schemas
 class DateRange(BaseModel):
     start_date: date
@@ -0,0 +1,83 @@
+import os
+import asyncio
+import functools
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from . import metrics
+
+SINGLEFLIGHT_TIMEOUT = float(os.getenv("SINGLEFLIGHT_TIMEOUT", "30"))
+
+
+class _Call:
+    def __init__(self):
+        self.done = asyncio.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run at most one computation per key at a time; concurrent callers share its outcome
+
+    Only the leader occupies a threadpool thread; the other callers wait on the event loop,
+    so a burst of identical requests cannot starve the pool used by every other sync route.
+    Results are not cached: once the leader finishes, the next call with the same key
+    computes again. Must be used from the event loop thread.
+    """
+
+    def __init__(self, timeout=SINGLEFLIGHT_TIMEOUT):
+        self.timeout = timeout
+        self._calls = {}
+
+    async def do(self, key, fn):
+        call = self._calls.get(key)
+        if call is not None:
+            metrics.incr("singleflight.coalesced")
+            try:
+                await asyncio.wait_for(call.done.wait(), self.timeout)
+            except asyncio.TimeoutError:
+                metrics.incr("singleflight.timeouts")
+                raise HTTPException(status_code=504, detail="Timed out waiting for an identical request")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        call = self._calls[key] = _Call()
+        metrics.incr("singleflight.leaders")
+        try:
+            call.result = await run_in_threadpool(fn)
+            return call.result
+        except Exception as e:
+            call.error = e
+            metrics.incr("singleflight.errors")
+            raise
+        except BaseException:
+            # Leader cancelled (e.g. its client went away): do not hand waiters a None result
+            call.error = HTTPException(status_code=503, detail="The identical request was cancelled, retry")
+            raise
+        finally:
+            del self._calls[key]
+            call.done.set()
+
+
+flight = SingleFlight()
+
+
+def coalesced(fn):
+    """
+    Share one in-flight execution between concurrent identical calls of a sync route
+
+    The wrapper is async, so FastAPI runs it on the event loop; only the leader's call of
+    `fn` goes to the threadpool. The key is the route, its query parameters and the database
+    the session is bound to (primary or replica), so read-your-writes clients are not served
+    replica results.
+    """
+    @functools.wraps(fn)
+    async def wrapper(**kwargs):
+        db = kwargs.get("db")
+        bind = str(db.get_bind().url) if db is not None else None
+        params = tuple(sorted((name, value) for name, value in kwargs.items() if name != "db"))
+        return await flight.do((fn.__module__, fn.__name__, bind, params), functools.partial(fn, **kwargs))
+    return wrapper
@@ -0,0 +1,31 @@
+import sys
+import os
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import get_engine, SessionLocal
+from app.archive import archive_sales, SALES_ARCHIVE_HORIZON_DAYS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old sales into the compressed archive files")
+    parser.add_argument(
+        "--horizon-days", type=int, default=SALES_ARCHIVE_HORIZON_DAYS,
+        help="archive sales older than this many days"
+    )
+    args = parser.parse_args()
+
+    get_engine()
+    db = SessionLocal()
+    try:
+        moved = archive_sales(db, horizon_days=args.horizon_days)
+        print(f"Archived {moved} sales older than {args.horizon_days} days")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import sys
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import get_engine, SessionLocal
+from app.checkpoints import create_checkpoint
+
+
+if __name__ == "__main__":
+    get_engine()
+    db = SessionLocal()
+    try:
+        checkpoint = create_checkpoint(db)
+        print(f"Inventory checkpoint {checkpoint.id} taken at {checkpoint.taken_at}")
+    finally:
+        db.close()
@@ -0,0 +1,53 @@
+import sys
+import os
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import get_engine, SessionLocal
+from app.catalog_import import CatalogImporter, iter_lines, FORMATS, IMPORT_CHUNK_SIZE
+
+
+def read_chunks(path, size=1 << 16):
+    with open(path, "rb") as catalog:
+        while True:
+            chunk = catalog.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def print_progress(report):
+    print(
+        f"{report['rows']} rows: {report['inserted']} inserted, {report['updated']} updated, "
+        f"{report['error_count']} errors ({report['rows_per_second']} rows/s)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk upsert products from a CSV or NDJSON catalog")
+    parser.add_argument("path", help="catalog file")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="rows per batch")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    get_engine()
+    db = SessionLocal()
+    try:
+        importer = CatalogImporter(db, chunk_size=args.chunk_size, on_progress=print_progress)
+        report = importer.run(iter_lines(read_chunks(args.path)), fmt)
+    finally:
+        db.close()
+
+    print(f"Done in {report['elapsed_seconds']} s")
+    for error in report["errors"]:
+        print(f"line {error['line']}: {error['error']}")
+    if report["error_count"] > len(report["errors"]):
+        print(f"... and {report['error_count'] - len(report['errors'])} more errors")
+
+
+if __name__ == "__main__":
+    main()
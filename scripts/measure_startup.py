@@ -0,0 +1,43 @@
+import sys
+import os
+import json
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Runs in a fresh interpreter so that nothing is already imported or cached
+PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app, lifespan
+imported = time.perf_counter()
+
+async def boot():
+    async with lifespan(app):
+        return time.perf_counter()
+
+ready = asyncio.run(boot())
+print(json.dumps({
+    "import_ms": round((imported - started) * 1000, 1),
+    "time_to_ready_ms": round((ready - started) * 1000, 1),
+}))
+"""
+
+
+def measure(runs):
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=root, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return samples
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    samples = measure(runs)
+    for key in ("import_ms", "time_to_ready_ms"):
+        values = sorted(sample[key] for sample in samples)
+        print(f"{key}: min {values[0]} / median {values[len(values) // 2]} / max {values[-1]}")
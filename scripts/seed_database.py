@@ -2,16 +2,13 @@ import sys
 import os
 import random
 from datetime import datetime, timedelta
-import pymysql
 from dotenv import load_dotenv
 
 load_dotenv()
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from sqlalchemy.orm import Session
-from app.database import Base, engine, SessionLocal, Category, Product, Inventory, InventoryHistory, Sale
-
-Base.metadata.create_all(bind=engine)
+from app.database import init_db, SessionLocal, Category, Product, Inventory, InventoryHistory, Sale
 
 # Sample data
 categories = [
@@ -116,22 +113,9 @@ def seed_database():
 
 if __name__ == "__main__":
     try:
-        # Try to create the database if it doesn't exist
-        connection = pymysql.connect(
-            host=os.getenv("DB_HOST", "localhost"),
-            user=os.getenv("DB_USER", "root"),
-            password=os.getenv("DB_PASSWORD", ""),
-        )
-        cursor = connection.cursor()
-        
-        # Create database if it doesn't exist
-        cursor.execute("CREATE DATABASE IF NOT EXISTS forsit_test")
-        connection.commit()
-        
-        print("Database created or already exists.")
-        cursor.close()
-        connection.close()
-        
+        # Create the database (MySQL) and tables if they don't exist
+        init_db()
+
         # Populate/seed the database
         seed_database()
         
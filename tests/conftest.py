@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+# Configure a throwaway SQLite database before the app reads its settings
+_DATA_DIR = tempfile.mkdtemp(prefix="forsit-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DATA_DIR, 'primary.db')}"
+os.environ["DB_CREATE_SCHEMA"] = "true"
+os.environ["SALES_JOURNAL_DIR"] = os.path.join(_DATA_DIR, "sales_journal")
+os.environ["SALES_ARCHIVE_DIR"] = os.path.join(_DATA_DIR, "sales_archive")
+os.environ["ANALYTICS_POOL_WORKERS"] = "0"
+os.environ["INVENTORY_CHECKPOINT_INTERVAL"] = "0"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.database import Base, SessionLocal, get_engine, Category, Product, Inventory, Sale
+
+
+@pytest.fixture
+def client():
+    with TestClient(create_app()) as client:
+        yield client
+    Base.metadata.drop_all(bind=get_engine())
+
+
+@pytest.fixture
+def product(client):
+    db = SessionLocal()
+    try:
+        category = Category(name="Electronics")
+        db.add(category)
+        db.commit()
+        product = Product(name="Headphones", price=50.0, category_id=category.id)
+        db.add(product)
+        db.commit()
+        db.add(Inventory(product_id=product.id, quantity=20, low_stock_threshold=5))
+        db.add(Sale(product_id=product.id, quantity=2, total_price=100.0, platform="Amazon"))
+        db.commit()
+        db.refresh(product)
+        db.expunge(product)
+        return product
+    finally:
+        db.close()
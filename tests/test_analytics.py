@@ -0,0 +1,38 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app import analytics
+from app.analytics import AnalyticsPool
+
+
+def test_timed_out_job_keeps_its_slot_until_it_ends(monkeypatch):
+    monkeypatch.setattr(analytics, "ANALYTICS_INLINE_ROWS", 0)
+    monkeypatch.setattr(analytics, "ANALYTICS_JOB_TIMEOUT", 0.2)
+    monkeypatch.setattr(analytics, "ANALYTICS_SUBMIT_TIMEOUT", 0.1)
+    pool = AnalyticsPool(workers=1, max_pending=1)
+    try:
+        with pytest.raises(HTTPException) as timed_out:
+            pool.run(1, time.sleep, 1.5)
+        assert timed_out.value.status_code == 504
+
+        # The sleep is still running in the worker, so the only slot is still taken
+        with pytest.raises(HTTPException) as rejected:
+            pool.run(1, time.sleep, 0)
+        assert rejected.value.status_code == 503
+
+        time.sleep(1.5)
+        assert pool.run(1, sum, [1, 2, 3]) == 6
+    finally:
+        pool.shutdown()
+
+
+def test_shutdown_waits_for_running_jobs(monkeypatch):
+    monkeypatch.setattr(analytics, "ANALYTICS_INLINE_ROWS", 0)
+    monkeypatch.setattr(analytics, "ANALYTICS_JOB_TIMEOUT", 0.1)
+    pool = AnalyticsPool(workers=1, max_pending=1)
+    with pytest.raises(HTTPException):
+        pool.run(1, time.sleep, 0.5)
+    pool.shutdown()
+    assert pool._pending == 0
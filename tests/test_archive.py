@@ -0,0 +1,81 @@
+import random
+from datetime import datetime, timedelta
+
+from app import archive as archive_module
+from app.archive import SalesArchive, archive_sales
+from app.database import SessionLocal, Sale, SalesArchiveState
+
+
+def _rows(month, count):
+    rng = random.Random(7)
+    return [
+        {
+            "id": i + 1,
+            "product_id": rng.randint(1, 5),
+            "quantity": rng.randint(1, 4),
+            "total_price": round(rng.uniform(1, 100), 2),
+            "sale_date": month + timedelta(minutes=rng.randint(0, 60 * 24 * 27)),
+            "platform": rng.choice(["Amazon", "Walmart", None]),
+        }
+        for i in range(count)
+    ]
+
+
+def test_blocks_answer_ranges_like_the_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_module, "BLOCK_ROWS", 16)
+    month = datetime(2024, 3, 1)
+    rows = _rows(month, 100)
+    sales_archive = SalesArchive(str(tmp_path))
+    sales_archive.write_month(month, rows)
+
+    start, end = month + timedelta(days=3, hours=5), month + timedelta(days=19)
+    expected = sorted(
+        (row for row in rows if start <= row["sale_date"] < end),
+        key=lambda row: (row["sale_date"], row["id"])
+    )
+    total_sales, total_revenue, products_sold = sales_archive.summarize(start, end)
+    assert total_sales == len(expected)
+    assert abs(total_revenue - sum(row["total_price"] for row in expected)) < 1e-6
+    assert products_sold == sum(row["quantity"] for row in expected)
+
+    assert sales_archive.find(start, end, skip=5, limit=20) == expected[5:25]
+    amazon = [row for row in expected if row["platform"] == "Amazon" and row["product_id"] in {1, 2}]
+    assert sales_archive.find(start, end, product_ids={1, 2}, platform="Amazon", limit=1000) == amazon
+
+
+def test_evicted_files_are_closed_after_their_last_reader(tmp_path):
+    sales_archive = SalesArchive(str(tmp_path), cache_files=1)
+    march, april = datetime(2024, 3, 1), datetime(2024, 4, 1)
+    sales_archive.write_month(march, _rows(march, 10))
+    sales_archive.write_month(april, _rows(april, 10))
+
+    march_file = sales_archive.month_file(march)
+    april_file = sales_archive.month_file(april)
+    # Evicted while still in use: stays readable until released
+    assert not march_file._map.closed
+    assert march_file.date_slice(march, april) == (0, 10)
+    march_file.release()
+    assert march_file._map.closed
+
+    april_file.release()
+    assert not april_file._map.closed
+
+
+def test_archive_moves_only_whole_months(client, product, tmp_path):
+    now = datetime.utcnow()
+    horizon = now - timedelta(days=40)
+    cutoff = datetime(horizon.year, horizon.month, 1)
+    db = SessionLocal()
+    try:
+        db.add(Sale(product_id=product.id, quantity=1, total_price=50.0, sale_date=cutoff - timedelta(days=1)))
+        db.add(Sale(product_id=product.id, quantity=1, total_price=50.0, sale_date=cutoff))
+        db.commit()
+
+        sales_archive = SalesArchive(str(tmp_path))
+        assert archive_sales(db, horizon_days=40, sales_archive=sales_archive) == 1
+        assert db.get(SalesArchiveState, 1).archived_before == cutoff
+        # The month holding the horizon stays hot, so the next run has nothing to rewrite
+        assert db.query(Sale).filter(Sale.sale_date == cutoff).count() == 1
+        assert archive_sales(db, horizon_days=40, sales_archive=sales_archive) == 0
+    finally:
+        db.close()
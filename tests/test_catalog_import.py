@@ -0,0 +1,90 @@
+import json
+
+from app.catalog_import import iter_lines
+from app.database import SessionLocal, Category
+
+
+def test_iter_lines_splits_only_on_newline():
+    row = json.dumps({"name": "a\u2028b\x85c\x1e", "price": 1, "category": "x"}, ensure_ascii=False)
+    data = (row + "\n" + row + "\n").encode("utf-8")
+    chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+    assert list(iter_lines(chunks)) == [row + "\n", row + "\n"]
+
+
+def test_iter_lines_keeps_crlf_split_across_chunks():
+    assert list(iter_lines([b"name,price\r", b"\na,1\r\n", b"b,2"])) == ["name,price\r\n", "a,1\r\n", "b,2"]
+
+
+def _import(client, body, **params):
+    return client.post(
+        "/products/import", params=params, content=body.encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+
+
+def test_import_reports_long_names_as_row_errors(client):
+    body = "\n".join([
+        json.dumps({"name": "Lamp", "price": 20, "category": "Home"}),
+        json.dumps({"name": "x" * 201, "price": 1, "category": "Home"}),
+        json.dumps({"name": "Rug", "price": 5, "category": "y" * 101}),
+    ])
+    report = _import(client, body).json()
+    assert report["inserted"] == 1
+    assert [error["line"] for error in report["errors"]] == [2, 3]
+
+
+def test_import_keeps_going_after_a_failed_chunk(client, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+    from app.catalog_import import CatalogImporter
+
+    upsert = CatalogImporter._upsert_products
+    calls = []
+
+    def failing_once(self, by_key):
+        calls.append(by_key)
+        if len(calls) == 2:
+            raise OperationalError("INSERT", {}, Exception("connection lost"))
+        return upsert(self, by_key)
+
+    monkeypatch.setattr(CatalogImporter, "_upsert_products", failing_once)
+    body = "\n".join(json.dumps({"name": f"Item {i}", "price": i, "category": "Misc"}) for i in range(6))
+    response = _import(client, body, chunk_size=2)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["inserted"] == 4
+    assert report["error_count"] == 2
+    assert report["errors"][0]["line"] == 3
+    assert "lines 3-4" in report["errors"][0]["error"]
+
+
+def test_import_streams_progress(client):
+    body = "\n".join(json.dumps({"name": f"Item {i}", "price": i, "category": "Misc"}) for i in range(5))
+    response = _import(client, body, chunk_size=2, progress="true")
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["done"] for line in lines] == [False, False, False, True]
+    assert [line["rows"] for line in lines] == [2, 4, 5, 5]
+    assert lines[-1]["inserted"] == 5
+
+
+def test_import_matches_category_names_case_insensitively(client):
+    body = "\n".join([
+        json.dumps({"name": "Lamp", "price": 20, "category": "Home"}),
+        json.dumps({"name": "Rug", "price": 5, "category": "HOME"}),
+        json.dumps({"name": "Vase", "price": 8, "category": "home"}),
+        json.dumps({"name": "vase", "price": 9, "category": "Home"}),
+    ])
+    report = _import(client, body, chunk_size=2).json()
+    assert report["error_count"] == 0
+    assert report["categories_created"] == 1
+    assert report["inserted"] == 3
+
+    report = _import(client, json.dumps({"name": "Lamp", "price": 25, "category": "hOmE"})).json()
+    assert report["error_count"] == 0
+    assert report["categories_created"] == 0
+    assert report["updated"] == 1
+    db = SessionLocal()
+    try:
+        assert [name for name, in db.query(Category.name)] == ["Home"]
+    finally:
+        db.close()
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta
+
+from app import checkpoints
+from app.checkpoints import CHECKPOINT_GRACE, CheckpointScheduler, create_checkpoint, inventory_as_of
+from app.database import (
+    SessionLocal, Category, Product, Inventory, InventoryHistory, InventoryCheckpoint, InventoryCheckpointItem
+)
+
+TAKEN_AT = datetime(2024, 1, 10, 12, 0, 0)
+
+
+def _stock(db, name, quantity, created_at):
+    category = db.query(Category).filter(Category.name == "Electronics").first()
+    if category is None:
+        category = Category(name="Electronics")
+        db.add(category)
+        db.flush()
+    product = Product(name=name, price=10.0, category_id=category.id, created_at=created_at)
+    db.add(product)
+    db.flush()
+    inventory = Inventory(product_id=product.id, quantity=quantity, low_stock_threshold=5)
+    db.add(inventory)
+    db.flush()
+    return inventory
+
+
+def _checkpoint(db, taken_at, *inventories):
+    checkpoint = InventoryCheckpoint(taken_at=taken_at)
+    db.add(checkpoint)
+    db.flush()
+    for inventory, quantity in inventories:
+        db.add(InventoryCheckpointItem(
+            checkpoint_id=checkpoint.id, inventory_id=inventory.id,
+            product_id=inventory.product_id, quantity=quantity
+        ))
+    return checkpoint
+
+
+def _change(db, inventory, previous_quantity, new_quantity, change_date):
+    db.add(InventoryHistory(
+        inventory_id=inventory.id, previous_quantity=previous_quantity,
+        new_quantity=new_quantity, change_date=change_date
+    ))
+
+
+def _quantities(db, ts):
+    checkpoint, items = inventory_as_of(db, ts)
+    return checkpoint, {name: quantity for _, name, quantity in items}
+
+
+def test_ts_between_taken_at_and_copy_uses_value_before_later_change(client):
+    db = SessionLocal()
+    try:
+        inventory = _stock(db, "Headphones", 30, TAKEN_AT - timedelta(days=30))
+        # The copy ran after taken_at and already saw the change made at +30s
+        _checkpoint(db, TAKEN_AT, (inventory, 30))
+        _change(db, inventory, 20, 30, TAKEN_AT + timedelta(seconds=30))
+        db.commit()
+
+        checkpoint, quantities = _quantities(db, TAKEN_AT + timedelta(seconds=10))
+        assert checkpoint.taken_at == TAKEN_AT
+        assert quantities == {"Headphones": 20}
+        assert _quantities(db, TAKEN_AT + timedelta(seconds=40))[1] == {"Headphones": 30}
+        assert _quantities(db, TAKEN_AT + 3 * CHECKPOINT_GRACE)[1] == {"Headphones": 30}
+    finally:
+        db.close()
+
+
+def test_ts_after_later_inventory_update(client, product):
+    db = SessionLocal()
+    try:
+        create_checkpoint(db)
+    finally:
+        db.close()
+    before_update = datetime.utcnow()
+    response = client.put(f"/inventory/{product.id}", json={"quantity": 35})
+    assert response.status_code == 200
+
+    response = client.get("/inventory/as-of", params={"ts": datetime.utcnow().isoformat()})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["checkpoint_taken_at"] is not None
+    assert [item["quantity"] for item in body["items"]] == [35]
+
+    response = client.get("/inventory/as-of", params={"ts": before_update.isoformat()})
+    assert [item["quantity"] for item in response.json()["items"]] == [20]
+
+
+def test_inventory_created_after_checkpoint(client):
+    db = SessionLocal()
+    try:
+        old = _stock(db, "Headphones", 20, TAKEN_AT - timedelta(days=30))
+        _checkpoint(db, TAKEN_AT, (old, 20))
+        new = _stock(db, "Speakers", 8, TAKEN_AT + timedelta(hours=1))
+        _change(db, new, 5, 8, TAKEN_AT + timedelta(hours=3))
+        db.commit()
+
+        assert _quantities(db, TAKEN_AT + timedelta(minutes=30))[1] == {"Headphones": 20}
+        assert _quantities(db, TAKEN_AT + timedelta(hours=2))[1] == {"Headphones": 20, "Speakers": 5}
+        assert _quantities(db, TAKEN_AT + timedelta(hours=4))[1] == {"Headphones": 20, "Speakers": 8}
+    finally:
+        db.close()
+
+
+def test_ts_before_any_checkpoint(client):
+    db = SessionLocal()
+    try:
+        inventory = _stock(db, "Headphones", 20, TAKEN_AT - timedelta(days=30))
+        _stock(db, "Speakers", 7, TAKEN_AT - timedelta(hours=1))
+        _change(db, inventory, 10, 20, TAKEN_AT - timedelta(hours=12))
+        _checkpoint(db, TAKEN_AT, (inventory, 20))
+        db.commit()
+
+        checkpoint, quantities = _quantities(db, TAKEN_AT - timedelta(days=1))
+        assert checkpoint is None
+        assert quantities == {"Headphones": 10}
+        checkpoint, quantities = _quantities(db, TAKEN_AT - timedelta(minutes=30))
+        assert checkpoint is None
+        assert quantities == {"Headphones": 20, "Speakers": 7}
+    finally:
+        db.close()
+
+
+def test_scheduler_loses_slot_race_without_a_second_checkpoint(client, product, monkeypatch):
+    original = checkpoints.create_checkpoint
+
+    def raced(db, slot=None):
+        # Another worker saw the same latest checkpoint and committed first
+        other = SessionLocal()
+        try:
+            original(other, slot=slot)
+        finally:
+            other.close()
+        return original(db, slot=slot)
+
+    monkeypatch.setattr(checkpoints, "create_checkpoint", raced)
+    assert CheckpointScheduler(interval=3600).run_once() is None
+
+    db = SessionLocal()
+    try:
+        assert [slot for slot, in db.query(InventoryCheckpoint.slot)] == [1]
+        assert db.query(InventoryCheckpointItem).count() == 1
+    finally:
+        db.close()
@@ -0,0 +1,79 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from app import compression
+from app.compression import CompressionMiddleware
+
+MINIMUM_SIZE = 100
+LARGE = "x" * (MINIMUM_SIZE * 5)
+
+
+def _large(request):
+    return PlainTextResponse(LARGE)
+
+
+def _small(request):
+    return PlainTextResponse("x" * (MINIMUM_SIZE - 1))
+
+
+def _encoded(request):
+    return Response(gzip.compress(LARGE.encode()), media_type="text/plain", headers={"Content-Encoding": "gzip"})
+
+
+def _streamed(request):
+    return StreamingResponse(iter([b"first\n", b"second\n"]), media_type="text/plain")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Exercise the gzip path whether or not the optional brotli package is installed
+    monkeypatch.setattr(compression, "brotli", None)
+    app = Starlette(routes=[
+        Route("/large", _large), Route("/small", _small), Route("/encoded", _encoded), Route("/streamed", _streamed)
+    ])
+    app.add_middleware(CompressionMiddleware, minimum_size=MINIMUM_SIZE)
+    with TestClient(app) as client:
+        yield client
+
+
+def _raw(client, path, accept_encoding):
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_gzips_responses_above_minimum_size(client):
+    response, body = _raw(client, "/large", "br, gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-length"] == str(len(body))
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert gzip.decompress(body) == LARGE.encode()
+
+
+def test_passes_small_responses_through(client):
+    response, body = _raw(client, "/small", "gzip")
+    assert "content-encoding" not in response.headers
+    assert body == b"x" * (MINIMUM_SIZE - 1)
+
+
+def test_passes_already_encoded_responses_through(client):
+    response, body = _raw(client, "/encoded", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body) == LARGE.encode()
+
+
+def test_respects_q_zero(client):
+    response, body = _raw(client, "/large", "gzip;q=0, identity")
+    assert "content-encoding" not in response.headers
+    assert body == LARGE.encode()
+
+
+def test_compresses_streamed_responses(client):
+    response, body = _raw(client, "/streamed", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(body) == b"first\nsecond\n"
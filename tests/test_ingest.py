@@ -0,0 +1,128 @@
+import os
+import json
+import fcntl
+from datetime import datetime
+
+import pytest
+
+from app.ingest import SaleBuffer, LOCK_NAME, DEAD_LETTER_NAME
+from app.database import SessionLocal, Sale, Inventory, InventoryHistory, Product, SaleIngestBatch
+
+
+@pytest.fixture
+def buffer(client, tmp_path):
+    # Swap the app's buffer for one journaling into this test's directory
+    client.app.state.sale_buffer.stop()
+    buffer = SaleBuffer(directory=str(tmp_path / "journal"), flush_interval=1000)
+    buffer.start()
+    client.app.state.sale_buffer = buffer
+    yield buffer
+    buffer.stop()
+
+
+def _event(product_id, quantity=1, total_price=10.0):
+    return {
+        "product_id": product_id, "quantity": quantity, "total_price": total_price,
+        "platform": "Amazon", "sale_date": datetime.utcnow().isoformat(),
+    }
+
+
+def _write_segment(directory, name, events):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.jsonl")
+    with open(path, "w", encoding="utf-8") as segment:
+        for event in events:
+            segment.write(json.dumps(event) + "\n")
+    return path
+
+
+def _sale_count(product_id):
+    db = SessionLocal()
+    try:
+        return db.query(Sale).filter(Sale.product_id == product_id).count()
+    finally:
+        db.close()
+
+
+def test_posted_sale_is_written_on_flush(client, product, buffer):
+    response = client.post("/sales/", json={"product_id": product.id, "quantity": 3, "total_price": 150.0})
+    assert response.status_code == 202
+    assert _sale_count(product.id) == 1
+
+    buffer.flush()
+    db = SessionLocal()
+    try:
+        assert db.query(Sale).filter(Sale.product_id == product.id).count() == 2
+        inventory = db.query(Inventory).filter(Inventory.product_id == product.id).one()
+        assert inventory.quantity == 17
+        history = db.query(InventoryHistory).filter(InventoryHistory.inventory_id == inventory.id).one()
+        assert (history.previous_quantity, history.new_quantity) == (20, 17)
+        assert db.query(SaleIngestBatch).count() == 1
+    finally:
+        db.close()
+    # The applied segment is gone; only the new, empty active segment is left
+    segments = [name for name in os.listdir(buffer._worker_dir) if name.endswith(".jsonl")]
+    assert segments == [os.path.basename(buffer._segment)]
+
+
+def test_unknown_product_is_refused_before_journaling(client, product, buffer):
+    response = client.post("/sales/", json={"product_id": 999, "quantity": 1, "total_price": 1.0})
+    assert response.status_code == 404
+    assert buffer._pending == 0
+
+
+def test_recorded_batch_is_not_applied_again(client, product, buffer, tmp_path):
+    db = SessionLocal()
+    try:
+        db.add(SaleIngestBatch(id="00000000000000000001-applied", sales_count=1))
+        db.commit()
+    finally:
+        db.close()
+    path = _write_segment(str(tmp_path / "segments"), "00000000000000000001-applied", [_event(product.id)])
+    buffer._apply_segment(path)
+    assert _sale_count(product.id) == 1
+
+    path = _write_segment(str(tmp_path / "segments"), "00000000000000000002-fresh", [_event(product.id)])
+    buffer._apply_segment(path)
+    buffer._apply_segment(path)
+    assert _sale_count(product.id) == 2
+
+
+def test_only_unlocked_worker_directories_are_adopted(client, product, tmp_path):
+    directory = str(tmp_path / "journal")
+    dead = os.path.join(directory, "worker-dead")
+    live = os.path.join(directory, "worker-live")
+    _write_segment(dead, "00000000000000000001-dead", [_event(product.id), _event(product.id)])
+    open(os.path.join(dead, LOCK_NAME), "w").close()
+    _write_segment(live, "00000000000000000002-live", [_event(product.id)])
+    with open(os.path.join(live, LOCK_NAME), "w") as live_lock:
+        fcntl.flock(live_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        buffer = SaleBuffer(directory=directory, flush_interval=1000)
+        buffer.start()
+        try:
+            assert _sale_count(product.id) == 3
+            assert not os.path.exists(dead)
+            assert sorted(os.listdir(live)) == [LOCK_NAME, "00000000000000000002-live.jsonl"]
+        finally:
+            buffer.stop()
+
+
+def test_sale_for_deleted_product_goes_to_dead_letter(client, product, buffer):
+    response = client.post("/sales/", json={"product_id": product.id, "quantity": 1, "total_price": 50.0})
+    assert response.status_code == 202
+    db = SessionLocal()
+    try:
+        db.query(Sale).filter(Sale.product_id == product.id).delete()
+        db.query(Inventory).filter(Inventory.product_id == product.id).delete()
+        db.query(Product).filter(Product.id == product.id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+    buffer.flush()
+    with open(os.path.join(buffer.directory, DEAD_LETTER_NAME), encoding="utf-8") as dead_letter:
+        rejected = [json.loads(line) for line in dead_letter]
+    assert len(rejected) == 1
+    assert rejected[0]["product_id"] == product.id
+    assert rejected[0]["batch_id"]
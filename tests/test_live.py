@@ -0,0 +1,79 @@
+import asyncio
+from contextlib import nullcontext
+from datetime import datetime
+
+from app.live import LiveFeed
+
+
+class _Buffer:
+    applied_sequence = 3
+    listeners = []
+
+    def hold(self):
+        return nullcontext()
+
+
+def _sale(total_price):
+    return {
+        "product_id": 1, "quantity": 1, "total_price": total_price, "platform": None,
+        "category_id": 1, "sale_date": datetime.utcnow().isoformat(),
+    }
+
+
+def test_flushes_in_the_snapshot_are_not_applied_again(client, product):
+    feed = LiveFeed()
+    feed._buffer = _Buffer()
+    topic = feed._create_topic(("day", None, None))
+    assert topic.summary["total_sales"] == 1
+    assert topic.sequence == 3
+
+    # Flush 3 committed before the snapshot; its delayed update must be skipped
+    feed._apply(3, [_sale(100.0)])
+    assert topic.summary["total_sales"] == 1
+
+    feed._apply(4, [_sale(25.0)])
+    assert topic.summary["total_sales"] == 2
+    assert topic.summary["total_revenue"] == 125.0
+
+
+def test_subscribe_rebuilds_a_window_from_an_earlier_period(client, product):
+    feed = LiveFeed(resync_interval=0)
+
+    async def main():
+        feed.attach(asyncio.get_running_loop(), _Buffer())
+        stale = await feed.subscribe("day")
+        stale.topic.summary = {"period": "2000-01-01", "total_sales": 7, "total_revenue": 70.0, "products_sold": 7}
+        subscription = await feed.subscribe("day")
+        feed.detach()
+        return stale, subscription
+
+    stale, subscription = asyncio.run(main())
+    assert subscription.topic is stale.topic
+    assert subscription.topic.summary["period"] == datetime.utcnow().strftime("%Y-%m-%d")
+    assert subscription.topic.summary["total_sales"] == 1
+    messages = []
+    while not stale.queue.empty():
+        messages.append(stale.queue.get_nowait())
+    # The existing subscriber is resynchronised too
+    assert messages[-1]["type"] == "snapshot"
+    assert messages[-1]["summary"]["total_sales"] == 1
+
+
+def test_periodic_resync_corrects_drifted_windows(client, product):
+    feed = LiveFeed(resync_interval=0.05)
+
+    async def main():
+        feed.attach(asyncio.get_running_loop(), _Buffer())
+        subscription = await feed.subscribe("day")
+        # e.g. sales recorded by another worker process
+        subscription.topic.summary["total_sales"] = 40
+        await asyncio.sleep(0.3)
+        feed.detach()
+        return subscription
+
+    subscription = asyncio.run(main())
+    assert subscription.topic.summary["total_sales"] == 1
+    messages = []
+    while not subscription.queue.empty():
+        messages.append(subscription.queue.get_nowait())
+    assert [message["type"] for message in messages] == ["snapshot", "snapshot"]
@@ -0,0 +1,50 @@
+import pytest
+
+from app.database import SessionLocal, Product
+from app.routers.products import MAX_BATCH_IDS
+
+
+@pytest.fixture
+def second_product(product):
+    db = SessionLocal()
+    try:
+        # No inventory row
+        other = Product(name="Speakers", price=80.0, category_id=product.category_id)
+        db.add(other)
+        db.commit()
+        db.refresh(other)
+        db.expunge(other)
+        return other
+    finally:
+        db.close()
+
+
+def test_batch_accepts_comma_separated_and_repeated_ids(client, product, second_product):
+    response = client.get("/products/batch", params=[
+        ("ids", f"{second_product.id},999,{product.id}"), ("ids", str(second_product.id)), ("ids", "")
+    ])
+    assert response.status_code == 200
+    # Request order, duplicates once, unknown ids skipped
+    assert [item["id"] for item in response.json()] == [second_product.id, product.id]
+    assert response.json()[1]["category"]["name"] == "Electronics"
+
+
+def test_batch_rejects_non_integer_ids(client, product):
+    response = client.get("/products/batch", params={"ids": f"{product.id},abc"})
+    assert response.status_code == 422
+
+
+def test_batch_rejects_too_many_ids(client):
+    ids = ",".join(str(i) for i in range(1, MAX_BATCH_IDS + 2))
+    assert client.get("/products/batch", params={"ids": ids}).status_code == 422
+    ids = ",".join(str(i) for i in range(1, MAX_BATCH_IDS + 1))
+    assert client.get("/products/batch", params={"ids": ids}).json() == []
+
+
+def test_with_inventory_returns_null_without_inventory_row(client, product, second_product):
+    response = client.get("/products/with-inventory")
+    assert response.status_code == 200
+    by_id = {item["id"]: item for item in response.json()}
+    assert by_id[product.id]["inventory"]["quantity"] == 20
+    assert by_id[product.id]["category"]["name"] == "Electronics"
+    assert by_id[second_product.id]["inventory"] is None
@@ -0,0 +1,94 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app import database
+from app.main import create_app
+from app.database import Base, SessionLocal, ReadSessionLocal, Category, Product, STICKY_COOKIE
+
+
+@pytest.fixture
+def replica_url(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    monkeypatch.setattr(database, "SQLALCHEMY_READ_DATABASE_URL", url)
+    database.dispose_engine()
+    yield url
+    database.dispose_engine()
+
+
+@pytest.fixture
+def replica_client(replica_url):
+    with TestClient(create_app()) as client:
+        yield client
+    Base.metadata.drop_all(bind=database.get_engine())
+
+
+def _add_category(db, name):
+    category = Category(name=name)
+    db.add(category)
+    db.commit()
+    return category.id
+
+
+def _product_names(client):
+    response = client.get("/products/")
+    assert response.status_code == 200
+    return {product["name"] for product in response.json()}
+
+
+def test_reads_use_replica_until_a_write(replica_client, replica_url):
+    # The schema exists on both databases; give each a product the other does not have
+    db = SessionLocal()
+    try:
+        category_id = _add_category(db, "Books")
+        db.add(Product(name="On primary", price=10.0, category_id=category_id))
+        db.commit()
+    finally:
+        db.close()
+    engine = create_engine(replica_url)
+    try:
+        with Session(engine) as db:
+            replica_category_id = _add_category(db, "Books")
+            db.add(Product(name="On replica", price=10.0, category_id=replica_category_id))
+            db.commit()
+    finally:
+        engine.dispose()
+
+    assert _product_names(replica_client) == {"On replica"}
+    assert STICKY_COOKIE not in replica_client.cookies
+
+    response = replica_client.post(
+        "/products/", json={"name": "Written", "price": 5.0, "category_id": category_id}
+    )
+    assert response.status_code == 200
+    assert STICKY_COOKIE in replica_client.cookies
+
+    assert _product_names(replica_client) == {"On primary", "Written"}
+
+    replica_client.cookies.clear()
+    assert _product_names(replica_client) == {"On replica"}
+
+
+def test_replica_sessions_refuse_writes(replica_client):
+    db = ReadSessionLocal()
+    try:
+        db.add(Category(name="Misrouted"))
+        with pytest.raises(OperationalError):
+            db.commit()
+    finally:
+        db.rollback()
+        db.close()
+
+
+def test_init_db_leaves_server_replicas_alone(monkeypatch):
+    monkeypatch.setattr(database, "SQLALCHEMY_READ_DATABASE_URL", "mysql+pymysql://user@replica/forsit")
+    monkeypatch.setattr(database, "DB_CREATE_REPLICA_SCHEMA", False)
+    assert not database._creates_replica_schema()
+    monkeypatch.setattr(database, "DB_CREATE_REPLICA_SCHEMA", True)
+    assert database._creates_replica_schema()
+
+
+def test_init_db_creates_sqlite_replica_schema(replica_url):
+    assert database._creates_replica_schema()
@@ -0,0 +1,29 @@
+def test_fields_projects_sale_columns(client, product):
+    response = client.get("/sales/", params={"fields": "quantity,total_price"})
+    assert response.status_code == 200
+    assert response.json() == [{"quantity": 2, "total_price": 100.0}]
+
+
+def test_fields_with_only_product_columns(client, product):
+    response = client.get("/sales/", params={"fields": "product.name"})
+    assert response.status_code == 200
+    assert response.json() == [{"product": {"name": "Headphones"}}]
+
+
+def test_filter_fields_with_only_product_columns(client, product):
+    response = client.get(
+        "/sales/filter", params={"fields": "product.name,product.price", "platform": "Amazon"}
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"product": {"name": "Headphones", "price": 50.0}}]
+
+    response = client.get(
+        "/sales/filter", params={"fields": "product.name", "category_id": product.category_id}
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"product": {"name": "Headphones"}}]
+
+
+def test_unknown_field_is_rejected(client, product):
+    response = client.get("/sales/", params={"fields": "product.secret"})
+    assert response.status_code == 422
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta
+
+
+def test_comparison_includes_inclusive_period_ends(client, product):
+    now = datetime.utcnow()
+    response = client.get("/sales/comparison", params={
+        "period1_start": (now - timedelta(days=20)).isoformat(),
+        "period1_end": (now - timedelta(days=10)).isoformat(),
+        "period2_start": (now - timedelta(days=1)).isoformat(),
+        "period2_end": (now + timedelta(days=1)).isoformat(),
+    })
+    assert response.status_code == 200
+    comparison = response.json()
+    assert comparison["period1"]["total_sales"] == 0
+    assert comparison["period2"]["total_sales"] == 1
+    assert comparison["period2"]["total_revenue"] == 100.0
+    assert comparison["period2"]["products_sold"] == 2
+
+
+def test_daily_summary_counts_todays_sale(client, product):
+    response = client.get("/sales/daily", params={"days": 3})
+    assert response.status_code == 200
+    days = response.json()
+    assert len(days) == 3
+    assert days[0]["total_sales"] == 1
+    assert days[0]["total_revenue"] == 100.0
@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+import anyio
+from fastapi.concurrency import run_in_threadpool
+
+from app.singleflight import SingleFlight
+
+
+def test_waiters_do_not_hold_threadpool_threads():
+    flight = SingleFlight(timeout=5)
+    release = threading.Event()
+    computations = []
+
+    def compute():
+        computations.append(1)
+        release.wait(5)
+        return "result"
+
+    async def main():
+        # Two threads: one for the leader, one that must stay free for other work
+        anyio.to_thread.current_default_thread_limiter().total_tokens = 2
+        calls = [asyncio.ensure_future(flight.do("key", compute)) for _ in range(20)]
+        await asyncio.sleep(0.1)
+        other = await asyncio.wait_for(run_in_threadpool(lambda: "other route"), 2)
+        release.set()
+        return other, await asyncio.gather(*calls)
+
+    other, results = asyncio.run(main())
+    assert other == "other route"
+    assert results == ["result"] * 20
+    assert len(computations) == 1
+
+
+def test_waiters_share_the_leaders_error():
+    flight = SingleFlight(timeout=5)
+
+    def fail():
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(
+            *(flight.do("key", fail) for _ in range(5)), return_exceptions=True
+        )
+
+    errors = asyncio.run(main())
+    assert all(isinstance(error, ValueError) for error in errors)